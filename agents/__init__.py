@@ -1,19 +1,20 @@
 """Agents package for the Agentic RAG System."""
 
 from .base_agent import BaseAgent
-from .document_agent import document_agent, DocumentAgent
-from .excel_agent import excel_agent, ExcelAgent
-from .qa_agent import qa_agent, QAAgent
-from .router_agent import router_agent, RouterAgent
+from .document_agent import get_document_agent, DocumentAgent
+from .excel_agent import get_excel_agent, ExcelAgent
+from .qa_agent import get_qa_agent, QAAgent
+from .router_agent import get_router_agent, RouterAgent, clear_answer_cache
 
 __all__ = [
     'BaseAgent',
-    'document_agent',
+    'get_document_agent',
     'DocumentAgent',
-    'excel_agent',
+    'get_excel_agent',
     'ExcelAgent',
-    'qa_agent',
+    'get_qa_agent',
     'QAAgent',
-    'router_agent',
-    'RouterAgent'
+    'get_router_agent',
+    'RouterAgent',
+    'clear_answer_cache'
 ]
@@ -1,17 +1,110 @@
 """Base agent class for the agentic system."""
 
-from typing import Dict, Any, List, Optional
+import asyncio
+import functools
+import hashlib
+import importlib
+import inspect
+from typing import AsyncIterator, Callable, Dict, Any, Iterator, List, Optional, Tuple
 from abc import ABC, abstractmethod
 
-from core.llm import llm
-from core.vector_store import vector_store
-from core.embeddings import embedding_generator
+import numpy as np
+
+from utils.cache import LRUCache, hash_key
+from utils.config import config
 from utils.logger import logger
+from utils.similarity import cosine_scores
+
+
+# Query embeddings are shared by every agent, so a repeated query only
+# pays for the embedding model once regardless of which agent serves it.
+query_embedding_cache = LRUCache(
+    maxsize=config.EMBEDDING_CACHE_SIZE,
+    ttl=config.EMBEDDING_CACHE_TTL
+)
+
+
+class _LazyBackend:
+    """
+    Class attribute that resolves a core backend on first access.
+    
+    attr names a zero-argument getter in the module.
+    """
+    
+    def __init__(self, module: str, attr: str):
+        self.module = module
+        self.attr = attr
+        self._value = None
+    
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        if self._value is None:
+            self._value = getattr(importlib.import_module(self.module), self.attr)()
+        return self._value
+
+
+def agent_safe(error_answer: str, strict: bool = False) -> Callable:
+    """
+    Turn exceptions raised by an agent's query method into an error result.
+    
+    Works on both sync and async methods. The failure is logged under the
+    agent's name and the caller gets the dict built by error_result.
+    
+    Args:
+        error_answer: Answer text returned to the user on failure
+        strict: Re-raise after logging when config.AGENT_STRICT is set
+        
+    Returns:
+        Method decorator
+    """
+    def decorator(method: Callable) -> Callable:
+        def handle(self: "BaseAgent", e: Exception) -> Dict[str, Any]:
+            logger.error(f"Error in {self.name}.{method.__name__}: {e}")
+            if strict and config.AGENT_STRICT:
+                raise
+            return self.error_result(error_answer, e)
+        
+        if inspect.iscoroutinefunction(method):
+            @functools.wraps(method)
+            async def async_wrapper(self, query: str, **kwargs) -> Dict[str, Any]:
+                try:
+                    return await method(self, query, **kwargs)
+                except Exception as e:
+                    return handle(self, e)
+            return async_wrapper
+        
+        @functools.wraps(method)
+        def wrapper(self, query: str, **kwargs) -> Dict[str, Any]:
+            try:
+                return method(self, query, **kwargs)
+            except Exception as e:
+                return handle(self, e)
+        return wrapper
+    
+    return decorator
 
 
 class BaseAgent(ABC):
     """Base class for all agents in the system."""
     
+    __slots__ = ('name', 'description', 'system_prompt', '_embed_cache')
+    
+    # Backends are shared and only loaded once an agent actually uses them
+    llm = _LazyBackend('core.llm', 'get_llm')
+    vector_store = _LazyBackend('core.vector_store', 'get_vector_store')
+    embedding_generator = _LazyBackend('core.embeddings', 'get_embedding_generator')
+    reranker = _LazyBackend('core.reranker', 'get_reranker')
+    
+    # Metadata filter used for retrieval (None searches every document)
+    filter_metadata: Optional[Dict[str, Any]] = None
+    
+    # Fixed reply when retrieval finds nothing (None answers without context)
+    no_context_answer: Optional[str] = None
+    
+    # HNSW search breadth; higher trades latency for recall (None uses the store default)
+    ef_search: Optional[int] = None
+    
     def __init__(self, name: str, description: str):
         """
         Initialize base agent.
@@ -22,9 +115,8 @@ class BaseAgent(ABC):
         """
         self.name = name
         self.description = description
-        self.llm = llm
-        self.vector_store = vector_store
-        self.embedding_generator = embedding_generator
+        self.system_prompt: Optional[str] = None
+        self._embed_cache = query_embedding_cache
         logger.info(f"Initialized {self.name}")
     
     @abstractmethod
@@ -41,11 +133,203 @@ class BaseAgent(ABC):
         """
         pass
     
+    async def aprocess_query(self, query: str, **kwargs) -> Dict[str, Any]:
+        """
+        Process a user query without blocking the event loop.
+        
+        Retrieval is awaited on the event loop so concurrent queries can
+        share embedding and search batches; answer generation then runs in a
+        worker thread on the already-retrieved context.
+        
+        Args:
+            query: User query string
+            **kwargs: Additional arguments
+            
+        Returns:
+            Dict with answer and metadata
+        """
+        kwargs['context'] = await self.aprepare_context(query, **kwargs)
+        return await asyncio.to_thread(self.process_query, query, **kwargs)
+    
+    async def astream_query(self, query: str, **kwargs) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Process a user query, streaming the answer as it is generated.
+        
+        Args:
+            query: User query string
+            **kwargs: Additional arguments
+            
+        Yields:
+            {'type': 'token', 'text': ...} events while the answer is
+            generated, then one {'type': 'result', 'result': ...} event
+        """
+        try:
+            # Awaited on the loop so concurrent queries share a Milvus search
+            context = await self.aprepare_context(query, **kwargs)
+            
+            if not context and self.no_context_answer is not None:
+                yield {'type': 'token', 'text': self.no_context_answer}
+                yield {'type': 'result', 'result': self.build_result(self.no_context_answer, [])}
+                return
+            
+            pieces = []
+            async for piece in self.agenerate_answer_stream(query, context, self.system_prompt):
+                pieces.append(piece)
+                yield {'type': 'token', 'text': piece}
+            
+            yield {'type': 'result', 'result': self.build_result("".join(pieces), context)}
+            
+        except Exception as e:
+            logger.error(f"Error in {self.name}.astream_query: {e}")
+            yield {
+                'type': 'result',
+                'result': self.error_result("I encountered an error while processing your question.", e)
+            }
+    
+    def prepare_context(self, query: str, **kwargs) -> List[Dict[str, Any]]:
+        """
+        Retrieve and rerank the context used to answer a query.
+        
+        Args:
+            query: User query
+            **kwargs: Additional arguments (top_k, etc.); an already prepared
+                'context' is returned as is
+            
+        Returns:
+            Final context chunks, best first
+        """
+        if kwargs.get('context') is not None:
+            return kwargs['context']
+        
+        top_k = kwargs.get('top_k', 5)
+        
+        context = self.retrieve_context(
+            query=query,
+            top_k=self.candidate_count(top_k),
+            filter_metadata=self.filter_metadata,
+            ef_search=self.ef_search
+        )
+        
+        # Dedupe before reranking so the top chunks are all distinct
+        context = self.deduplicate_context(context)
+        
+        return self.rerank_results(query, context, top_k=3)
+    
+    async def aprepare_context(self, query: str, **kwargs) -> List[Dict[str, Any]]:
+        """Async variant of prepare_context."""
+        if kwargs.get('context') is not None:
+            return kwargs['context']
+        
+        top_k = kwargs.get('top_k', 5)
+        
+        context = await self.aretrieve_context(
+            query=query,
+            top_k=self.candidate_count(top_k),
+            filter_metadata=self.filter_metadata,
+            ef_search=self.ef_search
+        )
+        
+        context = self.deduplicate_context(context)
+        
+        # Cross-encoder scoring is CPU/GPU bound, keep it off the event loop
+        return await asyncio.to_thread(self.rerank_results, query, context, 3)
+    
+    def error_result(self, answer: str, error: Exception) -> Dict[str, Any]:
+        """
+        Build the result returned when a query fails.
+        
+        Args:
+            answer: Answer text shown to the user
+            error: The exception that caused the failure
+            
+        Returns:
+            Dict with answer, empty context, agent name, zero confidence and error
+        """
+        return {
+            'answer': answer,
+            'context': [],
+            'agent': self.name,
+            'confidence': 0.0,
+            'error': str(error)
+        }
+    
+    def build_result(
+        self,
+        answer: str,
+        context: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Assemble the result dict returned to callers.
+        
+        Args:
+            answer: Generated answer
+            context: Context the answer was generated from
+            
+        Returns:
+            Dict with answer, context, and metadata
+        """
+        # Calculate confidence based on similarity scores
+        avg_score, sources = self.summarize_context(context)
+        
+        return {
+            'answer': answer,
+            'context': context,
+            'agent': self.name,
+            'confidence': avg_score,
+            'sources': sources
+        }
+    
+    def embed_query(self, query: str) -> np.ndarray:
+        """
+        Get the embedding for a query, reusing cached vectors.
+        
+        Args:
+            query: User query
+            
+        Returns:
+            Query embedding
+        """
+        key = hash_key(query)
+        embedding = self._embed_cache.get(key)
+        if embedding is None:
+            embedding = self.embedding_generator.generate_query_embedding(query)
+            self._embed_cache.set(key, embedding)
+        return embedding
+    
+    async def aembed_query(self, query: str) -> np.ndarray:
+        """
+        Async variant of embed_query.
+        
+        Cache misses go through the micro-batcher, so concurrent queries
+        share a single embedding model call.
+        """
+        key = hash_key(query)
+        embedding = self._embed_cache.get(key)
+        if embedding is None:
+            embedding = await self.embedding_generator.aembed_batched(query)
+            self._embed_cache.set(key, embedding)
+        return embedding
+    
+    def candidate_count(self, top_k: int) -> int:
+        """
+        Number of chunks to retrieve so reranking can still return top_k.
+        
+        Args:
+            top_k: Number of chunks wanted after reranking
+            
+        Returns:
+            Number of candidates to fetch from the vector store
+        """
+        if self.reranker.enabled:
+            return top_k * config.RERANK_CANDIDATE_FACTOR
+        return top_k
+    
     def retrieve_context(
         self,
         query: str,
         top_k: int = 5,
-        filter_metadata: Optional[Dict[str, Any]] = None
+        filter_metadata: Optional[Dict[str, Any]] = None,
+        ef_search: Optional[int] = None
     ) -> List[Dict[str, Any]]:
         """
         Retrieve relevant context from vector store.
@@ -54,19 +338,47 @@ class BaseAgent(ABC):
             query: User query
             top_k: Number of results to retrieve
             filter_metadata: Optional metadata filters
+            ef_search: Optional HNSW search breadth
             
         Returns:
             List of retrieved documents
         """
         try:
-            # Generate query embedding
-            query_embedding = self.embedding_generator.generate_query_embedding(query)
+            # Generate (or reuse) query embedding
+            query_embedding = self.embed_query(query)
             
             # Search vector store
             results = self.vector_store.search(
                 query_embedding=query_embedding,
                 top_k=top_k,
-                filter_dict=filter_metadata
+                filter_dict=filter_metadata,
+                ef_search=ef_search
+            )
+            
+            logger.info(f"Retrieved {len(results)} context chunks")
+            return results
+            
+        except Exception as e:
+            logger.error(f"Error retrieving context: {e}")
+            return []
+    
+    async def aretrieve_context(
+        self,
+        query: str,
+        top_k: int = 5,
+        filter_metadata: Optional[Dict[str, Any]] = None,
+        ef_search: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Async variant of retrieve_context."""
+        try:
+            query_embedding = await self.aembed_query(query)
+            
+            # Shares a Milvus request with other concurrent queries
+            results = await self.vector_store.asearch(
+                query_embedding=query_embedding,
+                top_k=top_k,
+                filter_dict=filter_metadata,
+                ef_search=ef_search
             )
             
             logger.info(f"Retrieved {len(results)} context chunks")
@@ -83,7 +395,7 @@ class BaseAgent(ABC):
         top_k: int = 3
     ) -> List[Dict[str, Any]]:
         """
-        Rerank results using LLM (simple relevance scoring).
+        Rerank results with the cross-encoder, falling back to similarity score.
         
         Args:
             query: User query
@@ -93,24 +405,116 @@ class BaseAgent(ABC):
         Returns:
             Reranked results
         """
-        if not results:
+        if not results or top_k < 1:
             return []
         
         try:
-            # For now, just return top results based on similarity score
-            # In production, you could use a reranking model
-            sorted_results = sorted(
-                results,
-                key=lambda x: x.get('score', 0),
-                reverse=True
-            )
+            if self.reranker.enabled:
+                # One batched forward pass over all (query, chunk) pairs
+                scores = self.reranker.score(query, [r['text'] for r in results])
+                for result, score in zip(results, scores):
+                    result['rerank_score'] = float(score)
+            elif all('embedding' in r for r in results):
+                # Candidates carry their vectors: score them exactly client-side
+                scores = cosine_scores(
+                    self.embed_query(query),
+                    [r['embedding'] for r in results]
+                )
+            else:
+                scores = np.fromiter(
+                    (r.get('score', 0.0) for r in results),
+                    dtype=np.float32,
+                    count=len(results)
+                )
+            
+            # Partial selection of the top_k, then sort only those
+            if top_k < len(scores):
+                idx = np.argpartition(-scores, top_k - 1)[:top_k]
+            else:
+                idx = np.arange(len(scores))
+            idx = idx[np.argsort(-scores[idx], kind='stable')]
             
-            return sorted_results[:top_k]
+            return [results[i] for i in idx]
             
         except Exception as e:
             logger.error(f"Error reranking results: {e}")
             return results[:top_k]
     
+    def deduplicate_context(
+        self,
+        context: List[Dict[str, Any]],
+        threshold: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Drop exact and near-duplicate chunks, keeping the first occurrence.
+        
+        Overlapping chunk windows often return nearly identical passages;
+        sending them all to the LLM costs prompt tokens for no new information.
+        
+        Args:
+            context: Retrieved chunks, best first
+            threshold: Word-trigram Jaccard similarity above which a chunk
+                counts as a near duplicate
+            
+        Returns:
+            Deduplicated chunks in their original order
+        """
+        if threshold is None:
+            threshold = config.DEDUP_SIMILARITY_THRESHOLD
+        
+        seen_digests = set()
+        kept_shingles = []
+        unique = []
+        
+        for chunk in context:
+            text = chunk.get('text') or ''
+            
+            digest = hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest()
+            if digest in seen_digests:
+                continue
+            seen_digests.add(digest)
+            
+            words = text.split()
+            shingles = {tuple(words[i:i + 3]) for i in range(max(len(words) - 2, 1))}
+            if any(
+                len(shingles & other) / len(shingles | other) > threshold
+                for other in kept_shingles
+            ):
+                continue
+            
+            kept_shingles.append(shingles)
+            unique.append(chunk)
+        
+        if len(unique) < len(context):
+            logger.info(f"Dropped {len(context) - len(unique)} duplicate context chunks")
+        
+        return unique
+    
+    def summarize_context(
+        self,
+        context: List[Dict[str, Any]]
+    ) -> Tuple[float, List[str]]:
+        """
+        Compute confidence and sources for the final context in one pass.
+        
+        Args:
+            context: Reranked context chunks
+            
+        Returns:
+            Tuple of (average similarity score, unique source names in rank order)
+        """
+        if not context:
+            return 0.0, []
+        
+        scores = np.empty(len(context), dtype=np.float32)
+        sources = {}
+        for i, chunk in enumerate(context):
+            scores[i] = chunk.get('score', 0.0)
+            # dict keeps first-seen (i.e. best-ranked) order, unlike a set
+            sources[(chunk.get('metadata') or {}).get('source', 'Unknown')] = None
+        
+        return float(scores.mean()), list(sources)
+    
     def generate_answer(
         self,
         query: str,
@@ -139,5 +543,61 @@ class BaseAgent(ABC):
             logger.error(f"Error generating answer: {e}")
             return "I apologize, but I encountered an error while generating the answer."
     
+    async def agenerate_answer(
+        self,
+        query: str,
+        context: List[Dict[str, Any]],
+        system_prompt: Optional[str] = None
+    ) -> str:
+        """Async variant of generate_answer."""
+        return await asyncio.to_thread(
+            self.generate_answer, query, context, system_prompt
+        )
+    
+    def generate_answer_stream(
+        self,
+        query: str,
+        context: List[Dict[str, Any]],
+        system_prompt: Optional[str] = None
+    ) -> Iterator[str]:
+        """
+        Generate an answer with the LLM, yielding text as it is produced.
+        
+        Args:
+            query: User query
+            context: Retrieved context
+            system_prompt: Optional system prompt
+            
+        Returns:
+            Iterator over answer text pieces
+        """
+        return self.llm.generate_answer_stream(
+            query=query,
+            context=context,
+            system_prompt=system_prompt
+        )
+    
+    async def agenerate_answer_stream(
+        self,
+        query: str,
+        context: List[Dict[str, Any]],
+        system_prompt: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """Async variant of generate_answer_stream."""
+        pieces = self.generate_answer_stream(query, context, system_prompt)
+        done = object()
+        
+        try:
+            while True:
+                piece = await asyncio.to_thread(next, pieces, done)
+                if piece is done:
+                    break
+                yield piece
+        finally:
+            # Releases the model promptly when the consumer stops early
+            close = getattr(pieces, 'close', None)
+            if close is not None:
+                close()
+    
     def __str__(self) -> str:
         return f"{self.name}: {self.description}"
@@ -1,13 +1,26 @@
 """Document agent for handling general document queries."""
 
-from typing import Dict, Any, List
-from agents.base_agent import BaseAgent
+from functools import cache
+from typing import Dict, Any
+from agents.base_agent import BaseAgent, agent_safe
 from utils.logger import logger
 
 
 class DocumentAgent(BaseAgent):
     """Agent specialized in answering questions from general documents."""
     
+    __slots__ = ()
+    
+    # Filter to only document types (exclude Excel)
+    filter_metadata = {
+        'file_type': ['.pdf', '.docx', '.pptx', '.txt']
+    }
+    
+    no_context_answer = "I couldn't find any relevant information in the documents to answer your question."
+    
+    # Favor recall: document answers depend on finding the right passage
+    ef_search = 200
+    
     def __init__(self):
         super().__init__(
             name="DocumentAgent",
@@ -22,6 +35,7 @@ class DocumentAgent(BaseAgent):
 
 Be precise, factual, and helpful in your responses."""
     
+    @agent_safe("I encountered an error while processing your question about the documents.")
     def process_query(self, query: str, **kwargs) -> Dict[str, Any]:
         """
         Process a query about documents.
@@ -33,69 +47,30 @@ Be precise, factual, and helpful in your responses."""
         Returns:
             Dict with answer, context, and metadata
         """
-        try:
-            logger.info(f"DocumentAgent processing query: {query}")
-            
-            # Get parameters
-            top_k = kwargs.get('top_k', 5)
-            
-            # Filter to only document types (exclude Excel)
-            filter_metadata = {
-                'file_type': ['.pdf', '.docx', '.pptx', '.txt']
-            }
-            
-            # Retrieve context
-            context = self.retrieve_context(
-                query=query,
-                top_k=top_k,
-                filter_metadata=None  # Milvus filtering can be complex, retrieve all then filter
-            )
-            
-            # Filter results by file type
-            context = [
-                c for c in context 
-                if c.get('metadata', {}).get('file_type') in ['.pdf', '.docx', '.pptx', '.txt']
-            ]
-            
-            if not context:
-                return {
-                    'answer': "I couldn't find any relevant information in the documents to answer your question.",
-                    'context': [],
-                    'agent': self.name,
-                    'confidence': 0.0
-                }
-            
-            # Rerank results
-            context = self.rerank_results(query, context, top_k=3)
-            
-            # Generate answer
-            answer = self.generate_answer(
-                query=query,
-                context=context,
-                system_prompt=self.system_prompt
-            )
-            
-            # Calculate confidence based on similarity scores
-            avg_score = sum(c.get('score', 0) for c in context) / len(context) if context else 0
-            
-            return {
-                'answer': answer,
-                'context': context,
-                'agent': self.name,
-                'confidence': float(avg_score),
-                'sources': list(set(c.get('metadata', {}).get('source', 'Unknown') for c in context))
-            }
-            
-        except Exception as e:
-            logger.error(f"Error in DocumentAgent.process_query: {e}")
+        logger.info(f"DocumentAgent processing query: {query}")
+        
+        # Retrieve and rerank context (file type filter is applied inside the Milvus search)
+        context = self.prepare_context(query, **kwargs)
+        
+        if not context:
             return {
-                'answer': "I encountered an error while processing your question about the documents.",
+                'answer': self.no_context_answer,
                 'context': [],
                 'agent': self.name,
-                'confidence': 0.0,
-                'error': str(e)
+                'confidence': 0.0
             }
+        
+        # Generate answer
+        answer = self.generate_answer(
+            query=query,
+            context=context,
+            system_prompt=self.system_prompt
+        )
+        
+        return self.build_result(answer, context)
 
 
-# Create singleton instance
-document_agent = DocumentAgent()
+@cache
+def get_document_agent() -> DocumentAgent:
+    """Get the shared DocumentAgent, creating it on first use."""
+    return DocumentAgent()
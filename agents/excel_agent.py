@@ -1,13 +1,23 @@
 """Excel agent for handling spreadsheet data queries."""
 
+from functools import cache
 from typing import Dict, Any, List
-from agents.base_agent import BaseAgent
+from agents.base_agent import BaseAgent, agent_safe
 from utils.logger import logger
 
 
 class ExcelAgent(BaseAgent):
     """Agent specialized in answering questions from Excel spreadsheets."""
     
+    __slots__ = ()
+    
+    # Filter to Excel files only
+    filter_metadata = {
+        'file_type': ['.xlsx']
+    }
+    
+    no_context_answer = "I couldn't find any relevant information in the Excel files to answer your question."
+    
     def __init__(self):
         super().__init__(
             name="ExcelAgent",
@@ -22,6 +32,17 @@ class ExcelAgent(BaseAgent):
 
 Be analytical, precise with numbers, and clear in your explanations."""
     
+    def build_result(
+        self,
+        answer: str,
+        context: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Assemble the result dict; sources are the sheets the context came from."""
+        result = super().build_result(answer, context)
+        result['data_type'] = 'spreadsheet'
+        return result
+    
+    @agent_safe("I encountered an error while analyzing the Excel data.")
     def process_query(self, query: str, **kwargs) -> Dict[str, Any]:
         """
         Process a query about Excel data.
@@ -33,70 +54,30 @@ Be analytical, precise with numbers, and clear in your explanations."""
         Returns:
             Dict with answer, context, and metadata
         """
-        try:
-            logger.info(f"ExcelAgent processing query: {query}")
-            
-            # Get parameters
-            top_k = kwargs.get('top_k', 5)
-            
-            # Retrieve context - filter for Excel files
-            context = self.retrieve_context(
-                query=query,
-                top_k=top_k
-            )
-            
-            # Filter for Excel files only
-            context = [
-                c for c in context 
-                if c.get('metadata', {}).get('file_type') == '.xlsx'
-            ]
-            
-            if not context:
-                return {
-                    'answer': "I couldn't find any relevant information in the Excel files to answer your question.",
-                    'context': [],
-                    'agent': self.name,
-                    'confidence': 0.0
-                }
-            
-            # Rerank results
-            context = self.rerank_results(query, context, top_k=3)
-            
-            # Generate answer
-            answer = self.generate_answer(
-                query=query,
-                context=context,
-                system_prompt=self.system_prompt
-            )
-            
-            # Calculate confidence
-            avg_score = sum(c.get('score', 0) for c in context) / len(context) if context else 0
-            
-            # Extract sheet names from context
-            sheets = list(set(
-                c.get('metadata', {}).get('source', 'Unknown')
-                for c in context
-            ))
-            
-            return {
-                'answer': answer,
-                'context': context,
-                'agent': self.name,
-                'confidence': float(avg_score),
-                'sources': sheets,
-                'data_type': 'spreadsheet'
-            }
-            
-        except Exception as e:
-            logger.error(f"Error in ExcelAgent.process_query: {e}")
+        logger.info(f"ExcelAgent processing query: {query}")
+        
+        # Retrieve and rerank context (file type filter is applied inside the Milvus search)
+        context = self.prepare_context(query, **kwargs)
+        
+        if not context:
             return {
-                'answer': "I encountered an error while analyzing the Excel data.",
+                'answer': self.no_context_answer,
                 'context': [],
                 'agent': self.name,
-                'confidence': 0.0,
-                'error': str(e)
+                'confidence': 0.0
             }
+        
+        # Generate answer
+        answer = self.generate_answer(
+            query=query,
+            context=context,
+            system_prompt=self.system_prompt
+        )
+        
+        return self.build_result(answer, context)
 
 
-# Create singleton instance
-excel_agent = ExcelAgent()
+@cache
+def get_excel_agent() -> ExcelAgent:
+    """Get the shared ExcelAgent, creating it on first use."""
+    return ExcelAgent()
@@ -1,13 +1,19 @@
 """General QA agent for questions that don't require specific document context."""
 
-from typing import Dict, Any
-from agents.base_agent import BaseAgent
+from functools import cache
+from typing import Dict, Any, Iterator, List, Optional
+from agents.base_agent import BaseAgent, agent_safe
 from utils.logger import logger
 
 
 class QAAgent(BaseAgent):
     """Agent for general question answering."""
     
+    __slots__ = ('_no_context_prefix',)
+    
+    # Favor latency: retrieved context is optional for general questions
+    ef_search = 32
+    
     def __init__(self):
         super().__init__(
             name="QAAgent",
@@ -21,7 +27,26 @@ class QAAgent(BaseAgent):
 4. Be helpful and informative
 
 Provide accurate and useful responses."""
+        
+        # Everything before the query in the no-context prompt, built once
+        self._no_context_prefix = self.system_prompt + "\n\nQuestion: "
+    
+    def _no_context_prompt(self, query: str) -> str:
+        """Prompt used when no document context is available."""
+        return "".join((self._no_context_prefix, query, "\n\nAnswer:"))
     
+    def generate_answer_stream(
+        self,
+        query: str,
+        context: List[Dict[str, Any]],
+        system_prompt: Optional[str] = None
+    ) -> Iterator[str]:
+        """Stream an answer, using the LLM directly when there is no context."""
+        if context:
+            return super().generate_answer_stream(query, context, system_prompt)
+        return self.llm.generate_stream(self._no_context_prompt(query), temperature=0.7)
+    
+    @agent_safe("I encountered an error while processing your question.")
     def process_query(self, query: str, **kwargs) -> Dict[str, Any]:
         """
         Process a general query.
@@ -33,64 +58,29 @@ Provide accurate and useful responses."""
         Returns:
             Dict with answer and metadata
         """
-        try:
-            logger.info(f"QAAgent processing query: {query}")
-            
-            # Get parameters
-            top_k = kwargs.get('top_k', 5)
-            
-            # Try to retrieve any relevant context
-            context = self.retrieve_context(
+        logger.info(f"QAAgent processing query: {query}")
+        
+        # Try to retrieve and rerank any relevant context
+        context = self.prepare_context(query, **kwargs)
+        
+        # Generate answer
+        if context:
+            answer = self.generate_answer(
                 query=query,
-                top_k=top_k
+                context=context,
+                system_prompt=self.system_prompt
             )
-            
-            # Rerank if we have context
-            if context:
-                context = self.rerank_results(query, context, top_k=3)
-                avg_score = sum(c.get('score', 0) for c in context) / len(context)
-            else:
-                avg_score = 0.0
-            
-            # Generate answer
-            if context:
-                answer = self.generate_answer(
-                    query=query,
-                    context=context,
-                    system_prompt=self.system_prompt
-                )
-            else:
-                # No context available, use LLM directly
-                answer = self.llm.generate(
-                    f"{self.system_prompt}\n\nQuestion: {query}\n\nAnswer:",
-                    temperature=0.7
-                )
-            
-            sources = []
-            if context:
-                sources = list(set(
-                    c.get('metadata', {}).get('source', 'Unknown')
-                    for c in context
-                ))
-            
-            return {
-                'answer': answer,
-                'context': context,
-                'agent': self.name,
-                'confidence': float(avg_score),
-                'sources': sources
-            }
-            
-        except Exception as e:
-            logger.error(f"Error in QAAgent.process_query: {e}")
-            return {
-                'answer': "I encountered an error while processing your question.",
-                'context': [],
-                'agent': self.name,
-                'confidence': 0.0,
-                'error': str(e)
-            }
+        else:
+            # No context available, use LLM directly
+            answer = self.llm.generate(
+                self._no_context_prompt(query),
+                temperature=0.7
+            )
+        
+        return self.build_result(answer, context)
 
 
-# Create singleton instance
-qa_agent = QAAgent()
+@cache
+def get_qa_agent() -> QAAgent:
+    """Get the shared QAAgent, creating it on first use."""
+    return QAAgent()
@@ -1,31 +1,108 @@
 """Router agent that orchestrates and delegates to specialized agents."""
 
-from typing import Dict, Any, List
-from agents.base_agent import BaseAgent
-from agents.document_agent import document_agent
-from agents.excel_agent import excel_agent
-from agents.qa_agent import qa_agent
+import asyncio
+import re
+from functools import cache
+from typing import AsyncIterator, Dict, Any, List, Optional
+
+import numpy as np
+
+from agents.base_agent import BaseAgent, agent_safe
+from agents.document_agent import get_document_agent
+from agents.excel_agent import get_excel_agent
+from agents.qa_agent import get_qa_agent
+from utils.cache import LRUCache, SemanticCache, hash_key
+from utils.config import config
 from utils.logger import logger
 
 
+# Final answers, looked up by exact (normalized) query first and by
+# embedding similarity second. Cleared whenever the knowledge base changes.
+_ANSWER_CACHE = LRUCache(
+    maxsize=config.ANSWER_CACHE_SIZE,
+    ttl=config.ANSWER_CACHE_TTL
+)
+_SEMANTIC_ANSWER_CACHE = SemanticCache(
+    dim=config.EMBEDDING_DIM,
+    capacity=config.ANSWER_CACHE_SIZE,
+    threshold=config.SEMANTIC_CACHE_THRESHOLD,
+    ttl=config.ANSWER_CACHE_TTL
+)
+
+
+def clear_answer_cache() -> None:
+    """Drop all cached answers, e.g. after documents are added or removed."""
+    _ANSWER_CACHE.clear()
+    _SEMANTIC_ANSWER_CACHE.clear()
+
+
+# Keyword rules that settle obvious routing decisions without an LLM call.
+# Only file types and format names are matched; everyday words such as
+# "mean" or "report" are left to the classifier.
+_FAST_ROUTE_RULES = (
+    (
+        re.compile(
+            r'\b(spreadsheets?|excel|xlsx?|csv|worksheets?|pivot\s+tables?)\b',
+            re.IGNORECASE
+        ),
+        'excel'
+    ),
+    (
+        re.compile(
+            r'\b(pdfs?|docx?|pptx?|powerpoint)\b',
+            re.IGNORECASE
+        ),
+        'document'
+    ),
+)
+
+
+# Fixed parts of the LLM routing prompt; only the query changes between calls
+_ROUTE_PROMPT_PREFIX = """Analyze the following user query and determine which type of agent should handle it.
+
+Available agent types:
+1. document - For questions about general documents (PDF, Word, PowerPoint, text files)
+2. excel - For questions about spreadsheet data, tables, statistics, or numerical analysis
+3. qa - For general questions that don't require specific document analysis
+
+Query: """
+
+_ROUTE_PROMPT_SUFFIX = """
+
+Important guidelines:
+- Choose 'excel' if the query mentions data, numbers, statistics, tables, sheets, or analysis
+- Choose 'document' if the query asks about text content, policies, presentations, or written information
+- Choose 'qa' for general questions or when the type is unclear
+
+Respond with ONLY one word: document, excel, or qa
+
+Agent:"""
+
+
 class RouterAgent(BaseAgent):
     """Agent that routes queries to appropriate specialized agents."""
     
+    __slots__ = ('agents', '_route_cache')
+    
     def __init__(self):
         super().__init__(
             name="RouterAgent",
             description="Routes queries to the most appropriate specialized agent"
         )
         
-        # Register available agents
+        # Register available agents (factories, so agents are built on first dispatch)
         self.agents = {
-            'document': document_agent,
-            'excel': excel_agent,
-            'qa': qa_agent
+            'document': get_document_agent,
+            'excel': get_excel_agent,
+            'qa': get_qa_agent
         }
         
+        # LLM routing decisions, keyed by query hash
+        self._route_cache = LRUCache(maxsize=1024)
+        
         logger.info(f"RouterAgent initialized with {len(self.agents)} specialized agents")
     
+    @agent_safe("I encountered an error while routing your question.", strict=True)
     def process_query(self, query: str, **kwargs) -> Dict[str, Any]:
         """
         Route query to appropriate agent and return result.
@@ -37,36 +114,197 @@ class RouterAgent(BaseAgent):
         Returns:
             Dict with answer, routing decision, and metadata
         """
+        logger.info(f"RouterAgent analyzing query: {query}")
+        
+        top_k = kwargs.get('top_k', 5)
+        answer_key = self._answer_key(query, top_k)
+        cached = self._cached_answer(answer_key, top_k)
+        if cached is not None:
+            return cached
+        
+        query_embedding = self.embed_query(query)
+        cached = self._cached_answer(answer_key, top_k, query_embedding)
+        if cached is not None:
+            return cached
+        
+        # Analyze query and route to appropriate agent
+        agent_choice = self._route_query(query)
+        
+        logger.info(f"Routing to: {agent_choice}")
+        
+        # Get the selected agent
+        selected_agent = self.agents.get(agent_choice, get_qa_agent)()
+        
+        # Process query with selected agent
+        result = selected_agent.process_query(query, **kwargs)
+        
+        # Add routing information
+        result['router_decision'] = agent_choice
+        result['available_agents'] = list(self.agents.keys())
+        
+        self._store_answer(answer_key, top_k, query_embedding, result)
+        return result
+    
+    @agent_safe("I encountered an error while routing your question.", strict=True)
+    async def aprocess_query(self, query: str, **kwargs) -> Dict[str, Any]:
+        """
+        Async variant of process_query.
+        
+        The routing LLM call and the query embedding are independent, so they
+        run concurrently; the selected agent then finds the embedding in the
+        shared query cache instead of computing it again. Routing is abandoned
+        if the embedding finds a semantically cached answer.
+        
+        Args:
+            query: User query
+            **kwargs: Additional arguments
+            
+        Returns:
+            Dict with answer, routing decision, and metadata
+        """
+        logger.info(f"RouterAgent analyzing query: {query}")
+        
+        top_k = kwargs.get('top_k', 5)
+        answer_key = self._answer_key(query, top_k)
+        cached = self._cached_answer(answer_key, top_k)
+        if cached is not None:
+            return cached
+        
+        route_task = asyncio.create_task(self._a_route_query(query))
         try:
-            logger.info(f"RouterAgent analyzing query: {query}")
+            query_embedding = await self.aembed_query(query)
+        except BaseException:
+            route_task.cancel()
+            raise
+        
+        cached = self._cached_answer(answer_key, top_k, query_embedding)
+        if cached is not None:
+            route_task.cancel()
+            return cached
+        
+        agent_choice = await route_task
+        
+        logger.info(f"Routing to: {agent_choice}")
+        
+        selected_agent = self.agents.get(agent_choice, get_qa_agent)()
+        result = await selected_agent.aprocess_query(query, **kwargs)
+        
+        result['router_decision'] = agent_choice
+        result['available_agents'] = list(self.agents.keys())
+        
+        self._store_answer(answer_key, top_k, query_embedding, result)
+        return result
+    
+    async def astream_query(self, query: str, **kwargs) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Route a query and stream the selected agent's answer.
+        
+        Args:
+            query: User query
+            **kwargs: Additional arguments
             
-            # Analyze query and route to appropriate agent
-            agent_choice = self._route_query(query)
+        Yields:
+            A {'type': 'routing', 'agent': ...} event, then the selected
+            agent's token events and its final result event
+        """
+        try:
+            logger.info(f"RouterAgent analyzing query: {query}")
             
-            logger.info(f"Routing to: {agent_choice}")
+            top_k = kwargs.get('top_k', 5)
+            answer_key = self._answer_key(query, top_k)
+            cached = self._cached_answer(answer_key, top_k)
+            if cached is None:
+                route_task = asyncio.create_task(self._a_route_query(query))
+                try:
+                    query_embedding = await self.aembed_query(query)
+                except BaseException:
+                    route_task.cancel()
+                    raise
+                cached = self._cached_answer(answer_key, top_k, query_embedding)
+                if cached is not None:
+                    route_task.cancel()
             
-            # Get the selected agent
-            selected_agent = self.agents.get(agent_choice, qa_agent)
+            if cached is not None:
+                yield {'type': 'routing', 'agent': cached.get('router_decision')}
+                yield {'type': 'token', 'text': cached['answer']}
+                yield {'type': 'result', 'result': cached}
+                return
             
-            # Process query with selected agent
-            result = selected_agent.process_query(query, **kwargs)
+            agent_choice = await route_task
             
-            # Add routing information
-            result['router_decision'] = agent_choice
-            result['available_agents'] = list(self.agents.keys())
+            logger.info(f"Routing to: {agent_choice}")
+            yield {'type': 'routing', 'agent': agent_choice}
             
-            return result
+            selected_agent = self.agents.get(agent_choice, get_qa_agent)()
+            async for event in selected_agent.astream_query(query, **kwargs):
+                if event['type'] == 'result':
+                    result = event['result']
+                    result['router_decision'] = agent_choice
+                    result['available_agents'] = list(self.agents.keys())
+                    self._store_answer(answer_key, top_k, query_embedding, result)
+                yield event
             
         except Exception as e:
-            logger.error(f"Error in RouterAgent.process_query: {e}")
-            return {
-                'answer': "I encountered an error while routing your question.",
-                'context': [],
-                'agent': self.name,
-                'confidence': 0.0,
-                'error': str(e)
+            logger.error(f"Error in RouterAgent.astream_query: {e}")
+            if config.AGENT_STRICT:
+                raise
+            yield {
+                'type': 'result',
+                'result': self.error_result("I encountered an error while routing your question.", e)
             }
     
+    @staticmethod
+    def _answer_key(query: str, top_k: int) -> str:
+        """Exact-match answer cache key for a normalized query."""
+        return hash_key(f"{top_k}:{query.lower().strip()}")
+    
+    def _cached_answer(
+        self,
+        answer_key: str,
+        top_k: int,
+        query_embedding: Optional[np.ndarray] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Look up a previously generated answer.
+        
+        Args:
+            answer_key: Exact-match key from _answer_key
+            top_k: Retrieval depth the answer must have been produced with
+            query_embedding: If given, also try the semantic cache
+            
+        Returns:
+            Copy of the cached result tagged with the cache type, or None
+        """
+        if query_embedding is None:
+            result = _ANSWER_CACHE.get(answer_key)
+            cache_type = 'exact'
+        else:
+            result = _SEMANTIC_ANSWER_CACHE.get(query_embedding, key=top_k)
+            cache_type = 'semantic'
+        
+        if result is None:
+            return None
+        
+        logger.info(f"Answer cache hit ({cache_type})")
+        return {**result, 'cache': cache_type}
+    
+    @staticmethod
+    def _store_answer(
+        answer_key: str,
+        top_k: int,
+        query_embedding: np.ndarray,
+        result: Dict[str, Any]
+    ) -> None:
+        """Cache a successful result under both the exact and semantic keys."""
+        if 'error' in result:
+            return
+        _ANSWER_CACHE.set(answer_key, result)
+        _SEMANTIC_ANSWER_CACHE.set(query_embedding, result, key=top_k)
+    
+    async def _a_route_query(self, query: str) -> str:
+        """Async variant of _route_query."""
+        return await asyncio.to_thread(self._route_query, query)
+    
     def _route_query(self, query: str) -> str:
         """
         Determine which agent should handle the query.
@@ -77,46 +315,44 @@ class RouterAgent(BaseAgent):
         Returns:
             Agent name to route to
         """
+        fast_route = self._fast_route(query)
+        if fast_route is not None:
+            return fast_route
+        
+        key = hash_key(query)
+        cached_route = self._route_cache.get(key)
+        if cached_route is not None:
+            return cached_route
+        
         try:
             # Use LLM to classify the query
-            classification_prompt = f"""Analyze the following user query and determine which type of agent should handle it.
-
-Available agent types:
-1. document - For questions about general documents (PDF, Word, PowerPoint, text files)
-2. excel - For questions about spreadsheet data, tables, statistics, or numerical analysis
-3. qa - For general questions that don't require specific document analysis
-
-Query: {query}
-
-Important guidelines:
-- Choose 'excel' if the query mentions data, numbers, statistics, tables, sheets, or analysis
-- Choose 'document' if the query asks about text content, policies, presentations, or written information
-- Choose 'qa' for general questions or when the type is unclear
-
-Respond with ONLY one word: document, excel, or qa"""
+            classification_prompt = "".join((_ROUTE_PROMPT_PREFIX, query, _ROUTE_PROMPT_SUFFIX))
 
-            response = self.llm.generate(
-                classification_prompt,
-                temperature=0.1,
-                max_tokens=10
-            ).strip().lower()
-            
-            # Validate response
-            valid_agents = ['document', 'excel', 'qa']
-            
-            # Check if response contains any valid agent name
-            for agent in valid_agents:
-                if agent in response:
-                    return agent
-            
-            # Default to document agent if unclear
-            logger.warning(f"Could not determine agent from response: {response}, defaulting to 'document'")
-            return 'document'
+            # Constrained to one decode step over the agent names
+            agent = self.llm.classify_query(classification_prompt, list(self.agents))
+            self._route_cache.set(key, agent)
+            return agent
             
         except Exception as e:
             logger.error(f"Error routing query: {e}")
             return 'qa'  # Safe fallback
     
+    def _fast_route(self, query: str) -> Optional[str]:
+        """
+        Route by keyword rules when exactly one agent type matches.
+        
+        Args:
+            query: User query
+            
+        Returns:
+            Agent name, or None if no rule or conflicting rules fired
+        """
+        matches = {agent for pattern, agent in _FAST_ROUTE_RULES if pattern.search(query)}
+        
+        if len(matches) == 1:
+            return matches.pop()
+        return None
+    
     def get_agent_info(self) -> List[Dict[str, str]]:
         """
         Get information about all available agents.
@@ -129,9 +365,11 @@ Respond with ONLY one word: document, excel, or qa"""
                 'name': agent.name,
                 'description': agent.description
             }
-            for agent in self.agents.values()
+            for agent in (get_agent() for get_agent in self.agents.values())
         ]
 
 
-# Create singleton instance
-router_agent = RouterAgent()
+@cache
+def get_router_agent() -> RouterAgent:
+    """Get the shared RouterAgent, creating it on first use."""
+    return RouterAgent()
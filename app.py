@@ -1,13 +1,20 @@
 """Streamlit UI for the Agentic RAG System."""
 
+import asyncio
+import numpy as np
 import streamlit as st
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+import shutil
+import tempfile
+import threading
 import time
 from typing import List
 import os
 
-from core import document_processor, embedding_generator, vector_store
-from agents import router_agent
+from core import get_document_processor, get_embedding_generator, get_token_counter, get_vector_store
+from core.vector_store import BULK_INSERT_AVAILABLE
+from agents import get_router_agent, clear_answer_cache
 from utils import config, logger
 
 # Page configuration
@@ -71,6 +78,36 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
+@st.cache_resource
+def load_document_processor():
+    """Document processor, kept across reruns and module reloads."""
+    return get_document_processor()
+
+
+@st.cache_resource
+def load_embedding_generator():
+    """Embedding model, loaded on first upload and kept across reruns."""
+    return get_embedding_generator()
+
+
+@st.cache_resource
+def load_vector_store():
+    """Milvus connection, opened on first use and kept across reruns."""
+    return get_vector_store()
+
+
+@st.cache_data(ttl=config.STATS_CACHE_TTL)
+def load_db_stats() -> dict:
+    """Vector store stats, refreshed at most every STATS_CACHE_TTL seconds."""
+    return load_vector_store().get_stats()
+
+
+@st.cache_resource
+def load_agent_info() -> list:
+    """Names and descriptions of the routed agents (static)."""
+    return get_router_agent().get_agent_info()
+
+
 def initialize_session_state():
     """Initialize session state variables."""
     if 'messages' not in st.session_state:
@@ -81,59 +118,100 @@ def initialize_session_state():
         st.session_state.total_chunks = 0
 
 
+def parse_uploaded_file(uploaded_file, document_processor) -> dict:
+    """Save an upload to a temp file and split it into chunks."""
+    # A private temp dir keeps the original file name, which becomes the chunk source
+    temp_dir = tempfile.mkdtemp(prefix="rag_upload_")
+    temp_path = Path(temp_dir) / Path(uploaded_file.name).name
+    
+    try:
+        # Stream the upload to disk in 1MB blocks instead of one full-size buffer
+        uploaded_file.seek(0)
+        with open(temp_path, "wb") as f:
+            shutil.copyfileobj(uploaded_file, f, 1024 * 1024)
+        
+        return document_processor.process_file(str(temp_path))
+    finally:
+        # Clean up temp file
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
 def process_uploaded_files(uploaded_files):
     """Process uploaded files and add to vector store."""
     try:
         with st.spinner("Processing documents..."):
             all_chunks = []
-            all_embeddings = []
-            all_metadatas = []
+            metadata_blocks = []
+            results = [None] * len(uploaded_files)
             
             progress_bar = st.progress(0)
+            document_processor = load_document_processor()
             
-            for idx, uploaded_file in enumerate(uploaded_files):
-                # Save uploaded file temporarily
-                temp_path = Path(f"/tmp/{uploaded_file.name}")
-                temp_path.parent.mkdir(parents=True, exist_ok=True)
+            # Parse files concurrently; the parsers spend most of their time in
+            # I/O and C extensions, so threads overlap well
+            with ThreadPoolExecutor(max_workers=min(8, len(uploaded_files))) as executor:
+                futures = {
+                    executor.submit(parse_uploaded_file, uploaded_file, document_processor): idx
+                    for idx, uploaded_file in enumerate(uploaded_files)
+                }
                 
-                with open(temp_path, "wb") as f:
-                    f.write(uploaded_file.getbuffer())
-                
-                # Process file
-                try:
-                    result = document_processor.process_file(str(temp_path))
-                    
-                    chunks = result['chunks']
-                    metadatas = result['metadatas']
-                    
-                    # Generate embeddings
-                    st.info(f"Generating embeddings for {uploaded_file.name}...")
-                    embeddings = embedding_generator.generate_embeddings(chunks)
-                    
-                    all_chunks.extend(chunks)
-                    all_embeddings.extend(embeddings)
-                    all_metadatas.extend(metadatas)
+                for done, future in enumerate(as_completed(futures), start=1):
+                    idx = futures[future]
+                    try:
+                        results[idx] = future.result()
+                    except Exception as e:
+                        name = uploaded_files[idx].name
+                        st.error(f"Error processing {name}: {e}")
+                        logger.error(f"Error processing {name}: {e}")
                     
-                    # Clean up temp file
-                    temp_path.unlink()
-                    
-                except Exception as e:
-                    st.error(f"Error processing {uploaded_file.name}: {e}")
-                    logger.error(f"Error processing {uploaded_file.name}: {e}")
-                
-                # Update progress
-                progress_bar.progress((idx + 1) / len(uploaded_files))
+                    # Update progress
+                    progress_bar.progress(done / len(uploaded_files))
+            
+            # Keep upload order regardless of which file finished first
+            for result in results:
+                if result is not None:
+                    all_chunks.extend(result['chunks'])
+                    metadata_blocks.append(result['metadatas'])
             
             # Insert into vector store
             if all_chunks:
+                # Metadata stays columnar: one array per field across all files
+                all_metadatas = {
+                    key: np.concatenate([block[key] for block in metadata_blocks])
+                    for key in metadata_blocks[0]
+                }
+                
+                # Record LLM token counts so prompts can be budgeted without
+                # re-tokenizing; the tokenizer name lets a later model recount
+                token_counter = get_token_counter()
+                all_metadatas['num_tokens'] = np.asarray(
+                    token_counter.count_tokens(all_chunks), dtype=np.int32
+                )
+                all_metadatas['tokenizer'] = np.full(len(all_chunks), token_counter.name)
+                
+                # One encode call for every file amortizes the per-batch overhead
+                st.info("Generating embeddings...")
+                all_embeddings = load_embedding_generator().generate_embeddings(all_chunks)
+                
                 st.info("Storing documents in vector database...")
-                success = vector_store.insert(
+                vector_store = load_vector_store()
+                # Very large uploads are imported from a parquet file in one request
+                insert = (
+                    vector_store.bulk_insert
+                    if BULK_INSERT_AVAILABLE and len(all_chunks) >= config.BULK_INSERT_MIN_ROWS
+                    else vector_store.insert
+                )
+                success = insert(
                     texts=all_chunks,
                     embeddings=all_embeddings,
                     metadatas=all_metadatas
                 )
                 
                 if success:
+                    # One flush for the whole upload instead of one per batch
+                    vector_store.finalize()
+                    clear_answer_cache()
+                    load_db_stats.clear()
                     st.session_state.documents_processed = True
                     st.session_state.total_chunks = len(all_chunks)
                     st.success(f"✅ Successfully processed {len(uploaded_files)} files ({len(all_chunks)} chunks)")
@@ -145,6 +223,55 @@ def process_uploaded_files(uploaded_files):
         logger.error(f"Error in process_uploaded_files: {e}")
 
 
+@st.cache_resource
+def load_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Start the event loop shared by every session.
+    
+    Agent requests from concurrent sessions must run on one loop for the
+    embedding and search micro-batchers to combine them.
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="agent-loop", daemon=True).start()
+    return loop
+
+
+async def _next_event(events):
+    """Await the next event of an async generator."""
+    return await events.__anext__()
+
+
+async def _close_events(events):
+    """Close an async generator."""
+    await events.aclose()
+
+
+def stream_answer(prompt: str, top_k: int, result: dict):
+    """
+    Yield answer text from the router agent's stream for st.write_stream.
+    
+    The final result dict is copied into `result` once the stream ends.
+    """
+    loop = load_event_loop()
+    events = get_router_agent().astream_query(prompt, top_k=top_k)
+    
+    try:
+        while True:
+            try:
+                event = asyncio.run_coroutine_threadsafe(_next_event(events), loop).result()
+            except StopAsyncIteration:
+                break
+            
+            if event['type'] == 'token':
+                yield event['text']
+            elif event['type'] == 'result':
+                result.update(event['result'])
+                if 'error' in result:
+                    yield result['answer']
+    finally:
+        asyncio.run_coroutine_threadsafe(_close_events(events), loop).result()
+
+
 def get_agent_badge(agent_name: str) -> str:
     """Get HTML badge for agent."""
     agent_classes = {
@@ -203,13 +330,15 @@ def main():
         
         # Database stats
         st.header("📊 Database Stats")
-        stats = vector_store.get_stats()
-        st.metric("Documents in Database", stats.get('num_documents', 0))
+        stats = load_db_stats()
+        st.metric("Documents in Database", stats.get('documents', 0))
         
         if st.button("🗑️ Clear Database"):
             if st.session_state.total_chunks > 0:
                 with st.spinner("Clearing database..."):
-                    vector_store.delete_all()
+                    load_vector_store().delete_all()
+                    clear_answer_cache()
+                    load_db_stats.clear()
                     st.session_state.documents_processed = False
                     st.session_state.total_chunks = 0
                     st.success("Database cleared successfully")
@@ -219,7 +348,7 @@ def main():
         
         # Agent information
         st.header("🤖 Available Agents")
-        agents_info = router_agent.get_agent_info()
+        agents_info = load_agent_info()
         for agent in agents_info:
             st.markdown(f"**{agent['name']}**")
             st.caption(agent['description'])
@@ -280,42 +409,39 @@ def main():
         
         # Generate response
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                # Process query through router agent
-                result = router_agent.process_query(prompt, top_k=top_k)
-                
-                # Display answer
-                answer = result.get('answer', 'I could not generate an answer.')
-                st.markdown(answer)
-                
-                # Display metadata
-                agent_name = result.get('agent', 'Unknown')
-                st.markdown(
-                    f"Agent: {get_agent_badge(agent_name)}",
-                    unsafe_allow_html=True
-                )
-                
-                confidence = result.get('confidence', 0.0)
-                confidence_class = get_confidence_class(confidence)
-                st.markdown(
-                    f"Confidence: <span class='{confidence_class}'>{confidence:.2%}</span>",
-                    unsafe_allow_html=True
-                )
-                
-                # Display sources
-                sources = result.get('sources', [])
-                if sources:
-                    with st.expander("📚 Sources"):
-                        for source in sources:
-                            st.markdown(f"- {source}")
-                
-                # Display context
-                context = result.get('context', [])
-                if context:
-                    with st.expander("🔍 Retrieved Context"):
-                        for i, ctx in enumerate(context[:3]):
-                            st.markdown(f"**Chunk {i+1}** (Score: {ctx.get('score', 0):.3f})")
-                            st.markdown(f'<div class="source-box">{ctx["text"][:300]}...</div>', unsafe_allow_html=True)
+            # Stream the answer from the router agent as it is generated
+            result = {}
+            st.write_stream(stream_answer(prompt, top_k, result))
+            answer = result.get('answer', 'I could not generate an answer.')
+            
+            # Display metadata
+            agent_name = result.get('agent', 'Unknown')
+            st.markdown(
+                f"Agent: {get_agent_badge(agent_name)}",
+                unsafe_allow_html=True
+            )
+            
+            confidence = result.get('confidence', 0.0)
+            confidence_class = get_confidence_class(confidence)
+            st.markdown(
+                f"Confidence: <span class='{confidence_class}'>{confidence:.2%}</span>",
+                unsafe_allow_html=True
+            )
+            
+            # Display sources
+            sources = result.get('sources', [])
+            if sources:
+                with st.expander("📚 Sources"):
+                    for source in sources:
+                        st.markdown(f"- {source}")
+            
+            # Display context
+            context = result.get('context', [])
+            if context:
+                with st.expander("🔍 Retrieved Context"):
+                    for i, ctx in enumerate(context[:3]):
+                        st.markdown(f"**Chunk {i+1}** (Score: {ctx.get('score', 0):.3f})")
+                        st.markdown(f'<div class="source-box">{ctx["text"][:300]}...</div>', unsafe_allow_html=True)
         
         # Add assistant message
         st.session_state.messages.append({
@@ -1,17 +1,23 @@
 """Core functionality for the Agentic RAG System."""
 
-from .document_processor import document_processor, DocumentProcessor
-from .embeddings import embedding_generator, EmbeddingGenerator
-from .llm import llm, LLMInterface
-from .vector_store import vector_store, VectorStore
+from .document_processor import get_document_processor, DocumentProcessor
+from .embeddings import get_embedding_generator, EmbeddingGenerator, BatchingEmbeddingGenerator
+from .llm import get_llm, get_token_counter, LLMInterface, TokenCounter
+from .reranker import get_reranker, Reranker
+from .vector_store import get_vector_store, VectorStore
 
 __all__ = [
-    'document_processor',
+    'get_document_processor',
     'DocumentProcessor',
-    'embedding_generator',
+    'get_embedding_generator',
     'EmbeddingGenerator',
-    'llm',
+    'BatchingEmbeddingGenerator',
+    'get_llm',
+    'get_token_counter',
     'LLMInterface',
-    'vector_store',
+    'TokenCounter',
+    'get_reranker',
+    'Reranker',
+    'get_vector_store',
     'VectorStore'
 ]
@@ -1,18 +1,24 @@
 """Document processing for multiple file formats."""
 
 import os
-from typing import List, Dict, Any, Optional
+from functools import cache
+from typing import Dict, Any, Iterable, Iterator, List, Optional
 from pathlib import Path
-import re
 
 # Document parsers
 import PyPDF2
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # PyPDF2 is used instead
+    pdfium = None
 from docx import Document as DocxDocument
 from pptx import Presentation
+import numpy as np
 import pandas as pd
 
 from utils.config import config
 from utils.logger import logger
+from utils.text import chunk_spans, iter_chunks, normalize_whitespace
 
 
 class DocumentProcessor:
@@ -42,7 +48,8 @@ class DocumentProcessor:
             file_path: Path to the file
             
         Returns:
-            Dict with text, chunks, and metadata
+            Dict with chunks and metadata; 'metadatas' maps each field
+            name to an array with one entry per chunk
         """
         try:
             file_ext = Path(file_path).suffix.lower()
@@ -50,41 +57,35 @@ class DocumentProcessor:
             
             logger.info(f"Processing file: {file_name}")
             
-            # Extract text based on file type
+            # Extract text based on file type (PDF pages are streamed)
             if file_ext == '.pdf':
-                text = self._extract_pdf(file_path)
+                fragments = self._extract_pdf(file_path)
             elif file_ext == '.docx':
-                text = self._extract_docx(file_path)
+                fragments = (self._extract_docx(file_path),)
             elif file_ext == '.pptx':
-                text = self._extract_pptx(file_path)
+                fragments = (self._extract_pptx(file_path),)
             elif file_ext == '.xlsx':
-                text = self._extract_excel(file_path)
+                fragments = (self._extract_excel(file_path),)
             elif file_ext == '.txt':
-                text = self._extract_txt(file_path)
+                fragments = (self._extract_txt(file_path),)
             else:
                 raise ValueError(f"Unsupported file type: {file_ext}")
             
-            # Clean text
-            text = self._clean_text(text)
+            # Clean and chunk text as it is extracted
+            chunks = list(self._iter_chunks(fragments))
             
-            # Create chunks
-            chunks = self._create_chunks(text)
-            
-            # Create metadata for each chunk
-            metadatas = [
-                {
-                    'source': file_name,
-                    'file_type': file_ext,
-                    'chunk_index': i,
-                    'total_chunks': len(chunks)
-                }
-                for i in range(len(chunks))
-            ]
+            # Create metadata columns (one entry per chunk) rather than a dict per chunk
+            num_chunks = len(chunks)
+            metadatas = {
+                'source': np.full(num_chunks, file_name),
+                'file_type': np.full(num_chunks, file_ext),
+                'chunk_index': np.arange(num_chunks, dtype=np.int32),
+                'total_chunks': np.full(num_chunks, num_chunks, dtype=np.int32)
+            }
             
             logger.info(f"Processed {file_name}: {len(chunks)} chunks created")
             
             return {
-                'text': text,
                 'chunks': chunks,
                 'metadatas': metadatas,
                 'file_name': file_name,
@@ -95,22 +96,41 @@ class DocumentProcessor:
             logger.error(f"Error processing file {file_path}: {e}")
             raise
     
-    def _extract_pdf(self, file_path: str) -> str:
-        """Extract text from PDF."""
+    def _extract_pdf(self, file_path: str) -> Iterator[str]:
+        """Extract text from PDF, yielding one page at a time."""
         try:
-            text = []
+            if pdfium is not None:
+                yield from self._extract_pdf_pdfium(file_path)
+                return
+            
             with open(file_path, 'rb') as file:
                 pdf_reader = PyPDF2.PdfReader(file)
                 for page_num, page in enumerate(pdf_reader.pages):
                     page_text = page.extract_text()
                     if page_text:
-                        text.append(f"[Page {page_num + 1}]\n{page_text}")
-            
-            return "\n\n".join(text)
+                        yield f"[Page {page_num + 1}]\n{page_text}"
         except Exception as e:
             logger.error(f"Error extracting PDF: {e}")
             raise
     
+    def _extract_pdf_pdfium(self, file_path: str) -> Iterator[str]:
+        """Extract PDF pages with the PDFium engine (much faster than PyPDF2)."""
+        pdf = pdfium.PdfDocument(file_path)
+        try:
+            for page_num in range(len(pdf)):
+                page = pdf[page_num]
+                textpage = page.get_textpage()
+                try:
+                    page_text = textpage.get_text_range()
+                finally:
+                    textpage.close()
+                    page.close()
+                
+                if page_text.strip():
+                    yield f"[Page {page_num + 1}]\n{page_text}"
+        finally:
+            pdf.close()
+    
     def _extract_docx(self, file_path: str) -> str:
         """Extract text from DOCX."""
         try:
@@ -156,18 +176,17 @@ class DocumentProcessor:
                 sheet_text = [f"[Sheet: {sheet_name}]"]
                 sheet_text.append(f"Columns: {', '.join(df.columns.astype(str))}")
                 
-                # Add rows (limit to reasonable size)
-                for idx, row in df.head(100).iterrows():
-                    row_text = " | ".join([f"{col}: {val}" for col, val in row.items()])
-                    sheet_text.append(row_text)
+                # Add rows (limit to reasonable size), built column-wise
+                sheet_text.extend(self._format_rows(df.head(100)))
                 
                 # Add summary statistics for numeric columns
                 numeric_cols = df.select_dtypes(include=['number']).columns
                 if len(numeric_cols) > 0:
                     sheet_text.append("\nSummary Statistics:")
+                    stats = df[numeric_cols].agg(['mean', 'min', 'max'])
                     for col in numeric_cols:
-                        stats = f"{col} - Mean: {df[col].mean():.2f}, Min: {df[col].min():.2f}, Max: {df[col].max():.2f}"
-                        sheet_text.append(stats)
+                        mean, low, high = stats[col]
+                        sheet_text.append(f"{col} - Mean: {mean:.2f}, Min: {low:.2f}, Max: {high:.2f}")
                 
                 text.append("\n".join(sheet_text))
             
@@ -176,6 +195,18 @@ class DocumentProcessor:
             logger.error(f"Error extracting Excel: {e}")
             raise
     
+    @staticmethod
+    def _format_rows(df: pd.DataFrame) -> List[str]:
+        """Render each row as 'col: value | col: value' with vectorized string ops."""
+        cells = df.astype(str)
+        row_text = None
+        
+        for i, col in enumerate(df.columns):
+            labeled = f"{col}: " + cells.iloc[:, i]
+            row_text = labeled if row_text is None else row_text + " | " + labeled
+        
+        return [] if row_text is None else row_text.tolist()
+    
     def _extract_txt(self, file_path: str) -> str:
         """Extract text from TXT."""
         try:
@@ -187,16 +218,8 @@ class DocumentProcessor:
     
     def _clean_text(self, text: str) -> str:
         """Clean and normalize text."""
-        # Remove multiple spaces
-        text = re.sub(r'\s+', ' ', text)
-        
-        # Remove multiple newlines
-        text = re.sub(r'\n\s*\n', '\n\n', text)
-        
-        # Strip leading/trailing whitespace
-        text = text.strip()
-        
-        return text
+        # Collapse spaces and blank lines, keeping line and paragraph breaks
+        return normalize_whitespace(text)
     
     def _create_chunks(self, text: str) -> List[str]:
         """
@@ -208,43 +231,29 @@ class DocumentProcessor:
         Returns:
             List of text chunks
         """
-        if not text:
-            return []
+        return [
+            text[start:end]
+            for start, end in chunk_spans(text, self.chunk_size, self.chunk_overlap)
+        ]
+    
+    def _iter_chunks(self, fragments: Iterable[str]) -> Iterator[str]:
+        """
+        Clean and chunk text arriving in pieces.
         
-        chunks = []
-        start = 0
-        text_length = len(text)
+        Equivalent to _create_chunks(_clean_text(...)) on the fragments
+        joined by blank lines,
+        but chunks are produced while later fragments are still being read.
         
-        while start < text_length:
-            # Get chunk
-            end = start + self.chunk_size
-            chunk = text[start:end]
-            
-            # Try to break at sentence boundary if not at end
-            if end < text_length:
-                # Look for sentence endings
-                last_period = chunk.rfind('. ')
-                last_newline = chunk.rfind('\n')
-                last_break = max(last_period, last_newline)
-                
-                if last_break > self.chunk_size * 0.5:  # Only break if we're past halfway
-                    chunk = chunk[:last_break + 1]
-                    end = start + last_break + 1
-            
-            chunks.append(chunk.strip())
-            
-            # Move start position with overlap
-            start = end - self.chunk_overlap
+        Args:
+            fragments: Text pieces in document order
             
-            # Prevent infinite loop
-            if end >= text_length:
-                break
-        
-        # Remove empty chunks
-        chunks = [c for c in chunks if c.strip()]
-        
-        return chunks
+        Returns:
+            Iterator of text chunks
+        """
+        return iter_chunks(fragments, self.chunk_size, self.chunk_overlap)
 
 
-# Create singleton instance
-document_processor = DocumentProcessor()
+@cache
+def get_document_processor() -> DocumentProcessor:
+    """Get the shared DocumentProcessor, creating it on first use."""
+    return DocumentProcessor()
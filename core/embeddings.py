@@ -3,10 +3,99 @@ Embedding generation module using SentenceTransformers (LOCAL MODEL)
 Stable and recommended for RAG assignments.
 """
 
-from typing import List
+import hashlib
+from functools import cache
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import torch
 from sentence_transformers import SentenceTransformer
+from utils.batching import MicroBatcher
+from utils.cache import LRUCache
+from utils.config import config
 from utils.logger import logger
 
+try:
+    import diskcache
+except ImportError:  # chunk embeddings are cached in memory instead
+    diskcache = None
+
+try:
+    from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+except ImportError:  # the PyTorch encoder is used instead
+    ORTModelForFeatureExtraction = None
+
+
+class OnnxEncoder:
+    """
+    INT8 ONNX Runtime version of a sentence-transformers model.
+
+    The model is exported and dynamically quantized once into
+    cache_dir; later loads reuse the quantized files. encode() mirrors
+    SentenceTransformer.encode (mean pooling, truncation at
+    max_seq_length, optional normalization) and returns float32 numpy
+    arrays.
+    """
+
+    def __init__(self, model_id: str, cache_dir: str, max_seq_length: int = 256):
+        self.max_seq_length = max_seq_length
+        quantized_dir = Path(cache_dir) / "int8"
+
+        if not (quantized_dir / "model_quantized.onnx").exists():
+            logger.info(f"Exporting {model_id} to ONNX (INT8) in {cache_dir}")
+            export_dir = Path(cache_dir) / "fp32"
+            ORTModelForFeatureExtraction.from_pretrained(model_id, export=True).save_pretrained(export_dir)
+            AutoTokenizer.from_pretrained(model_id).save_pretrained(quantized_dir)
+
+            quantizer = ORTQuantizer.from_pretrained(export_dir)
+            quantizer.quantize(
+                save_dir=quantized_dir,
+                quantization_config=AutoQuantizationConfig.avx512_vnni(is_static=False)
+            )
+
+        self.tokenizer = AutoTokenizer.from_pretrained(quantized_dir)
+        self.session = ORTModelForFeatureExtraction.from_pretrained(
+            quantized_dir,
+            file_name="model_quantized.onnx"
+        )
+
+    def encode(
+        self,
+        texts,
+        batch_size: int = 32,
+        normalize_embeddings: bool = True,
+        **kwargs
+    ) -> np.ndarray:
+        """Encode a text or list of texts; a single text gives a 1-D vector."""
+        single = isinstance(texts, str)
+        if single:
+            texts = [texts]
+        batches = []
+
+        for start in range(0, len(texts), batch_size):
+            inputs = self.tokenizer(
+                texts[start:start + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors="np"
+            )
+            token_embeddings = self.session(**inputs).last_hidden_state
+
+            # Mean pooling over real (non-padding) tokens
+            mask = inputs["attention_mask"][..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            batches.append(pooled.astype(np.float32))
+
+        embeddings = np.vstack(batches) if batches else np.empty((0, config.EMBEDDING_DIM), dtype=np.float32)
+        if normalize_embeddings:
+            embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+
+        return embeddings[0] if single else embeddings
+
 
 class EmbeddingGenerator:
     """Generate embeddings using local sentence-transformer model."""
@@ -18,39 +107,219 @@ class EmbeddingGenerator:
         """
         self.model_name = "all-MiniLM-L6-v2"
 
-        logger.info(f"Loading embedding model: {self.model_name}")
-        self.model = SentenceTransformer(self.model_name)
+        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+
+        logger.info(f"Loading embedding model: {self.model_name} ({self.device})")
+        self.model = self._load_onnx_model() if self.device == "cpu" else None
+        self.onnx = self.model is not None
+        if not self.onnx:
+            self.model = SentenceTransformer(self.model_name, device=self.device)
+
+        # Backends give slightly different vectors for the same text
+        self.backend = "onnx-int8" if self.onnx else f"torch-{self.device}"
+
+        self._chunk_cache = self._open_chunk_cache()
+
+        if self.device == "cuda":
+            # Allow TF32 matmuls for anything autocast leaves in float32
+            torch.set_float32_matmul_precision("high")
+
+        if config.EMBEDDING_COMPILE and not self.onnx:
+            self._optimize_model()
+
+        self._check_dimension()
 
         logger.info("Embedding model loaded successfully")
 
+    def _load_onnx_model(self) -> Optional[OnnxEncoder]:
+        """INT8 ONNX encoder for CPU, or None to use the PyTorch model."""
+        if not config.EMBEDDING_ONNX_DIR:
+            return None
+        if ORTModelForFeatureExtraction is None:
+            logger.warning("optimum[onnxruntime] is not installed, using the PyTorch encoder")
+            return None
+
+        try:
+            encoder = OnnxEncoder(
+                f"sentence-transformers/{self.model_name}",
+                config.EMBEDDING_ONNX_DIR,
+                max_seq_length=256  # all-MiniLM-L6-v2 was trained on 256-token inputs
+            )
+            logger.info("Using INT8 ONNX Runtime encoder")
+            return encoder
+        except Exception as e:
+            logger.warning(f"Could not load ONNX encoder, using PyTorch: {e}")
+            return None
+
+    def _check_dimension(self) -> None:
+        """Fail fast if the model's output size differs from the Milvus schema."""
+        dim = self._encode(["dimension check"]).shape[1]
+        if dim != config.EMBEDDING_DIM:
+            raise ValueError(
+                f"{self.model_name} produces {dim}-d embeddings but EMBEDDING_DIM is "
+                f"{config.EMBEDDING_DIM}; the vector store schema would not match"
+            )
+
+    def _open_chunk_cache(self):
+        """Persistent chunk-embedding cache, or an in-memory LRU without diskcache."""
+        if diskcache is not None and config.EMBEDDING_DISK_CACHE_DIR:
+            logger.info(f"Caching chunk embeddings in {config.EMBEDDING_DISK_CACHE_DIR}")
+            return diskcache.Cache(config.EMBEDDING_DISK_CACHE_DIR)
+        return LRUCache(maxsize=config.CHUNK_EMBEDDING_CACHE_SIZE)
+
+    def _chunk_key(self, text: str) -> bytes:
+        """Cache key for a chunk; includes the model and backend so vectors never mix."""
+        digest = hashlib.blake2b(self.model_name.encode("utf-8"), digest_size=16)
+        digest.update(b"\0")
+        digest.update(self.backend.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8"))
+        return digest.digest()
+
+    def _optimize_model(self) -> None:
+        """
+        Compile the transformer inside the encoder to cut per-batch overhead.
+
+        Falls back to BetterTransformer's fused attention when torch.compile
+        is unavailable, and to the eager model if neither works.
+        """
+        transformer = self.model[0]
+        eager_model = transformer.auto_model
+
+        try:
+            if hasattr(torch, "compile"):
+                transformer.auto_model = torch.compile(
+                    eager_model,
+                    mode="reduce-overhead",
+                    dynamic=True
+                )
+            else:
+                from optimum.bettertransformer import BetterTransformer
+                transformer.auto_model = BetterTransformer.transform(eager_model)
+
+            # Pay the compilation cost once, at load time
+            self.model.encode(["warmup"], show_progress_bar=False)
+            logger.info("Embedding model optimized")
+        except Exception as e:
+            transformer.auto_model = eager_model
+            logger.warning(f"Could not optimize embedding model, using eager mode: {e}")
+
+    # --------------------------------------------------
+
+    def _encode(self, texts):
+        """Encode to unit-length float32 vectors in fixed-size batches."""
+        if self.onnx:
+            return self.model.encode(
+                texts,
+                batch_size=config.EMBEDDING_BATCH_SIZE,
+                normalize_embeddings=True
+            )
+
+        with torch.inference_mode(), torch.autocast(
+            device_type=self.device,
+            dtype=torch.float16,
+            enabled=self.device == "cuda"
+        ):
+            embeddings = self.model.encode(
+                texts,
+                batch_size=config.EMBEDDING_BATCH_SIZE,
+                convert_to_tensor=True,
+                normalize_embeddings=True,
+                show_progress_bar=False
+            )
+
+        # One device-to-host copy for the whole batch
+        return embeddings.float().cpu().numpy()
+
     # --------------------------------------------------
 
-    def generate_embedding(self, text: str) -> List[float]:
+    def generate_embedding(self, text: str) -> np.ndarray:
         """Generate embedding for a single text."""
         try:
-            embedding = self.model.encode(text)
-            return embedding.tolist()
+            return self._encode(text)
         except Exception as e:
             logger.error(f"Embedding error: {e}")
             raise
 
     # --------------------------------------------------
 
-    def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings for multiple texts."""
+    def generate_embeddings(self, texts: List[str]) -> np.ndarray:
+        """
+        Generate embeddings for multiple texts, one row per text.
+
+        Texts embedded before (e.g. a re-uploaded document) are served from
+        the chunk cache; only the misses go through the model. The cache
+        holds float16 vectors, and fresh vectors are rounded the same way so
+        a chunk always gets identical values.
+        """
         try:
-            embeddings = self.model.encode(texts)
-            return [emb.tolist() for emb in embeddings]
+            if not texts:
+                return np.empty((0, config.EMBEDDING_DIM), dtype=np.float32)
+
+            keys = [self._chunk_key(text) for text in texts]
+            embeddings = [self._chunk_cache.get(key) for key in keys]
+            misses = [i for i, embedding in enumerate(embeddings) if embedding is None]
+
+            if misses:
+                fresh = self._encode([texts[i] for i in misses]).astype(np.float16)
+                for i, embedding in zip(misses, fresh):
+                    embeddings[i] = embedding
+                    self._chunk_cache.set(keys[i], embedding)
+
+                logger.info(f"Embedded {len(misses)} of {len(texts)} texts ({len(texts) - len(misses)} cached)")
+
+            return np.vstack(embeddings).astype(np.float32)
         except Exception as e:
             logger.error(f"Batch embedding error: {e}")
             raise
 
     # --------------------------------------------------
 
-    def generate_query_embedding(self, query: str) -> List[float]:
+    def generate_query_embedding(self, query: str) -> np.ndarray:
         """Generate embedding for search query."""
         return self.generate_embedding(query)
 
 
-# Singleton
-embedding_generator = EmbeddingGenerator()
+class BatchingEmbeddingGenerator:
+    """
+    EmbeddingGenerator wrapper that micro-batches concurrent async queries.
+
+    Queries arriving within a short window are encoded in a single
+    model.encode call instead of one call each.
+    """
+
+    def __init__(self, generator: EmbeddingGenerator):
+        self.generator = generator
+        self.model_name = generator.model_name
+        # Queries have their own cache in the agents, so skip the chunk cache
+        self._batcher = MicroBatcher(
+            generator._encode,
+            max_batch_size=config.EMBEDDING_MAX_BATCH,
+            max_wait_ms=config.EMBEDDING_BATCH_WAIT_MS
+        )
+
+    # --------------------------------------------------
+
+    def generate_embedding(self, text: str) -> np.ndarray:
+        """Generate embedding for a single text."""
+        return self.generator.generate_embedding(text)
+
+    def generate_embeddings(self, texts: List[str]) -> np.ndarray:
+        """Generate embeddings for multiple texts, one row per text."""
+        return self.generator.generate_embeddings(texts)
+
+    def generate_query_embedding(self, query: str) -> np.ndarray:
+        """Generate embedding for search query."""
+        return self.generator.generate_query_embedding(query)
+
+    # --------------------------------------------------
+
+    async def aembed_batched(self, text: str) -> np.ndarray:
+        """Generate an embedding, sharing the model call with concurrent requests."""
+        return await self._batcher.submit(text)
+
+
+@cache
+def get_embedding_generator() -> BatchingEmbeddingGenerator:
+    """Get the shared embedding generator, loading the model on first use."""
+    return BatchingEmbeddingGenerator(EmbeddingGenerator())
@@ -1,33 +1,231 @@
 """
 Local LLM interface using HuggingFace pipeline
 (Stable replacement for Gemini)
+
+When LLM_GGUF_PATH points at a quantized GGUF model and llama-cpp-python
+is installed, generation runs through llama.cpp instead.
 """
 
-from transformers import pipeline
-from typing import List, Dict, Optional
+import os
+from functools import cache
+from threading import Lock, Thread
+import torch
+from transformers import (
+    AutoModelForCausalLM,
+    AutoTokenizer,
+    BitsAndBytesConfig,
+    TextIteratorStreamer,
+    pipeline
+)
+from typing import Iterator, List, Dict, Optional
+from utils.config import config
 from utils.logger import logger
 
+try:
+    from llama_cpp import Llama
+except ImportError:  # optional backend
+    Llama = None
+
+
+# Answer length reserved in the context window by each backend
+LLAMA_MAX_TOKENS = 512
+HF_MAX_NEW_TOKENS = 150
+
+
+def _use_llama() -> bool:
+    """Whether generation runs through llama.cpp rather than transformers."""
+    return bool(config.LLM_GGUF_PATH) and Llama is not None
+
+
+def tokenizer_name() -> str:
+    """Identify the active LLM tokenizer, to tag token counts stored at ingest."""
+    if _use_llama():
+        return os.path.basename(config.LLM_GGUF_PATH)
+    return config.LLM_HF_MODEL
+
+
+class TokenCounter:
+    """Count LLM tokens with the model's tokenizer only, without its weights."""
+
+    def __init__(self):
+        self.name = tokenizer_name()
+        self._llama = None
+        self._tokenizer = None
+
+        if _use_llama():
+            self._llama = Llama(
+                model_path=config.LLM_GGUF_PATH,
+                vocab_only=True,
+                verbose=False
+            )
+        else:
+            self._tokenizer = AutoTokenizer.from_pretrained(config.LLM_HF_MODEL)
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """
+        Count tokens for each text, in one tokenizer call where possible.
+
+        Args:
+            texts: Texts to measure
+
+        Returns:
+            Token count per text
+        """
+        if self._llama is not None:
+            return [
+                len(self._llama.tokenize(text.encode("utf-8"), add_bos=False))
+                for text in texts
+            ]
+
+        encoded = self._tokenizer(texts, add_special_tokens=False)["input_ids"]
+        return [len(ids) for ids in encoded]
+
 
 class LLMInterface:
     def __init__(self):
-        logger.info("Loading local LLM (distilgpt2)...")
+        self.generator = None
+        self.model = None
+        self.tokenizer_name = tokenizer_name()
 
-        self.generator = pipeline(
-            "text-generation",
-            model="distilgpt2",
-            max_new_tokens=150
-        )
+        # llama.cpp shares one context and KV cache per Llama instance, so
+        # calls into it from worker threads must run one at a time
+        self._llama_lock = Lock()
+
+        # classify_query label token ids per category tuple (None: labels collide)
+        self._label_token_cache: Dict[tuple, Optional[List[int]]] = {}
+
+        if _use_llama():
+            logger.info(f"Loading local LLM (llama.cpp): {config.LLM_GGUF_PATH}")
+
+            self.model = Llama(
+                model_path=config.LLM_GGUF_PATH,
+                n_ctx=config.LLM_CONTEXT_SIZE,
+                n_threads=config.LLM_THREADS or os.cpu_count(),
+                n_batch=512,
+                use_mmap=True,
+                use_mlock=False,
+                verbose=False
+            )
+            self.context_length = config.LLM_CONTEXT_SIZE
+            self.max_new_tokens = LLAMA_MAX_TOKENS
+        else:
+            if config.LLM_GGUF_PATH:
+                logger.warning("llama-cpp-python is not installed, falling back to transformers")
+
+            self.generator = self._load_hf_pipeline(config.LLM_HF_MODEL)
+
+            model_limit = (
+                getattr(self.generator.model.config, "max_position_embeddings", None)
+                or self.generator.tokenizer.model_max_length
+            )
+            self.context_length = min(model_limit, config.LLM_CONTEXT_SIZE)
+            self.max_new_tokens = HF_MAX_NEW_TOKENS
+
+        self._separator_tokens = self.count_tokens(["\n\n"])[0]
 
         logger.info("Local LLM ready")
 
-    def generate(self, prompt: str, temperature=0.7, max_tokens=512) -> str:
+    def _load_hf_pipeline(self, model_name: str):
+        """
+        Load a transformers text-generation pipeline.
+
+        On CUDA with bitsandbytes installed the weights are quantized to
+        4-bit NF4; otherwise the model runs in fp16 on GPU or fp32 on CPU.
+        """
+        logger.info(f"Loading local LLM ({model_name})...")
+
+        model_kwargs = {}
+        quantized = False
+
+        if torch.cuda.is_available():
+            if config.LLM_LOAD_IN_4BIT:
+                try:
+                    import bitsandbytes  # noqa: F401
+                    model_kwargs["quantization_config"] = BitsAndBytesConfig(
+                        load_in_4bit=True,
+                        bnb_4bit_compute_dtype=torch.float16,
+                        bnb_4bit_quant_type="nf4"
+                    )
+                    model_kwargs["device_map"] = "auto"
+                    quantized = True
+                except ImportError:
+                    logger.warning("bitsandbytes is not installed, loading the LLM in fp16")
+            if not quantized:
+                model_kwargs["torch_dtype"] = torch.float16
+
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModelForCausalLM.from_pretrained(model_name, **model_kwargs)
+
+        if torch.cuda.is_available() and not quantized:
+            model = model.to("cuda")
+
+        if config.LLM_COMPILE and hasattr(torch, "compile"):
+            model.forward = torch.compile(model.forward, mode="reduce-overhead")
+
+        return pipeline(
+            "text-generation",
+            model=model,
+            tokenizer=tokenizer,
+            max_new_tokens=HF_MAX_NEW_TOKENS
+        )
+
+    def generate(self, prompt: str, temperature=0.7, max_tokens=LLAMA_MAX_TOKENS) -> str:
         try:
+            if self.model is not None:
+                with self._llama_lock:
+                    return self.model(
+                        prompt,
+                        max_tokens=max_tokens,
+                        temperature=temperature,
+                        stop=["\n\n"]
+                    )["choices"][0]["text"]
+
             result = self.generator(prompt)[0]["generated_text"]
             return result
         except Exception as e:
             logger.error(f"LLM generation error: {e}")
             return "Generation failed."
 
+    def generate_stream(self, prompt: str, temperature=0.7, max_tokens=LLAMA_MAX_TOKENS) -> Iterator[str]:
+        """
+        Yield generated text pieces as soon as the model produces them.
+
+        With llama.cpp the model stays locked until the generator is
+        exhausted or closed, so close it when stopping early.
+        """
+        if self.model is not None:
+            # A plain Lock, since consecutive next() calls may come from
+            # different worker threads
+            with self._llama_lock:
+                try:
+                    for chunk in self.model(
+                        prompt,
+                        max_tokens=max_tokens,
+                        temperature=temperature,
+                        stop=["\n\n"],
+                        stream=True
+                    ):
+                        yield chunk["choices"][0]["text"]
+                except Exception as e:
+                    logger.error(f"LLM streaming error: {e}")
+            return
+
+        streamer = TextIteratorStreamer(
+            self.generator.tokenizer,
+            skip_prompt=True,
+            skip_special_tokens=True
+        )
+
+        def _run():
+            try:
+                self.generator(prompt, streamer=streamer)
+            except Exception as e:
+                logger.error(f"LLM streaming error: {e}")
+                streamer.end()
+
+        Thread(target=_run, daemon=True).start()
+        yield from streamer
+
     def generate_answer(
         self,
         query: str,
@@ -35,27 +233,194 @@ class LLMInterface:
         system_prompt: Optional[str] = None
     ) -> str:
 
-        context_str = "\n\n".join([
-            chunk["text"] for chunk in context
-        ])
+        return self.generate(self._build_answer_prompt(query, context))
 
-        prompt = f"""
-Context:
-{context_str}
+    def generate_answer_stream(
+        self,
+        query: str,
+        context: List[Dict[str, str]],
+        system_prompt: Optional[str] = None
+    ) -> Iterator[str]:
 
-Question:
-{query}
+        return self.generate_stream(self._build_answer_prompt(query, context))
 
-Answer:
-"""
+    def _build_answer_prompt(
+        self,
+        query: str,
+        context: List[Dict[str, str]]
+    ) -> str:
+
+        question = ("\n\nQuestion:\n", query, "\n\nAnswer:\n")
+
+        # Collect every piece and join once, instead of join + f-string copies
+        parts = ["\nContext:\n"]
+        for text in self._fit_context(context, self._context_budget(parts[0], *question)):
+            parts.append(text)
+            parts.append("\n\n")
+        if len(parts) > 1:
+            parts.pop()  # no separator after the last chunk
+        parts.extend(question)
+
+        return "".join(parts)
+
+    def _context_budget(self, *template: str) -> int:
+        """
+        Tokens left for retrieved context in one prompt.
+
+        CONTEXT_TOKEN_BUDGET overrides the budget when set; otherwise it is
+        the context window minus the answer length and the prompt template
+        (with the query) around the context.
+        """
+        if config.CONTEXT_TOKEN_BUDGET:
+            return config.CONTEXT_TOKEN_BUDGET
+
+        overhead = self.count_tokens(["".join(template)])[0]
+        return max(self.context_length - self.max_new_tokens - overhead, 0)
+
+    def _fit_context(self, context: List[Dict[str, str]], budget: int) -> List[str]:
+        """
+        Keep the best-ranked chunks that fit in the context token budget.
+
+        Chunk token counts recorded at ingest ('num_tokens' in the chunk
+        metadata) are used when they were measured with the active model's
+        tokenizer ('tokenizer' in the metadata); other chunks are tokenized
+        again. The first chunk is always kept.
+        """
+        texts = []
+
+        for chunk in context:
+            metadata = chunk.get("metadata") or {}
+            num_tokens = metadata.get("num_tokens")
+            if num_tokens is None or metadata.get("tokenizer") != self.tokenizer_name:
+                num_tokens = self.count_tokens([chunk["text"]])[0]
+            num_tokens += self._separator_tokens
+
+            if texts and num_tokens > budget:
+                break
+
+            budget -= num_tokens
+            texts.append(chunk["text"])
+
+        return texts
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """
+        Count LLM tokens for each text, in one tokenizer call where possible.
+
+        Args:
+            texts: Texts to measure
 
-        return self.generate(prompt)
+        Returns:
+            Token count per text
+        """
+        if self.model is not None:
+            return [
+                len(self.model.tokenize(text.encode("utf-8"), add_bos=False))
+                for text in texts
+            ]
 
-    def classify_query(self, query: str, categories: List[str]) -> str:
-        return categories[0]
+        encoded = self.generator.tokenizer(texts, add_special_tokens=False)["input_ids"]
+        return [len(ids) for ids in encoded]
+
+    def classify_query(self, prompt: str, categories: List[str]) -> str:
+        """
+        Pick one of the categories as the continuation of a prompt.
+
+        Instead of sampling free text, this runs a single forward pass and
+        compares the next-token logits of each category's first token, so
+        the answer is always a valid category and costs one decode step.
+
+        Args:
+            prompt: Classification prompt, ending where the label should go
+            categories: Candidate labels (their first tokens must differ)
+
+        Returns:
+            The highest-scoring category
+
+        Raises:
+            ValueError: If the labels cannot be told apart by their first token
+        """
+        if self.model is not None:
+            return self._classify_llama(prompt, categories)
+
+        tokenizer = self.generator.tokenizer
+        model = self.generator.model
+
+        label_ids = self._label_tokens(categories)
+
+        inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
+        with torch.inference_mode():
+            logits = model(**inputs).logits[0, -1]
+
+        return categories[int(torch.argmax(logits[label_ids]))]
+
+    def _classify_llama(self, prompt: str, categories: List[str]) -> str:
+        """classify_query for llama.cpp: bias decoding onto the label tokens."""
+        label_ids = self._label_tokens(categories)
+
+        with self._llama_lock:
+            output = self.model(
+                prompt,
+                max_tokens=1,
+                temperature=0.0,
+                logit_bias={token: 100.0 for token in label_ids}
+            )
+
+        # Match the emitted text against each label token's own text rather
+        # than re-tokenizing it, which may not give the same token back
+        text = output["choices"][0]["text"]
+        for token, category in zip(label_ids, categories):
+            if self.model.detokenize([token]).decode("utf-8", errors="ignore") == text:
+                return category
+
+        raise ValueError(f"Classifier emitted {text!r}, which is not a label token")
+
+    def _label_tokens(self, categories: List[str]) -> List[int]:
+        """
+        First token id of each category label, checked to be pairwise distinct.
+
+        Labels are tried with a leading space, then without: SentencePiece
+        vocabularies may split the space into its own piece, which makes
+        every " label" start with the same token. The result is cached per
+        set of categories.
+
+        Raises:
+            ValueError: If no form gives each label its own first token
+        """
+        key = tuple(categories)
+        if key not in self._label_token_cache:
+            self._label_token_cache[key] = None
+
+            for prefix in (" ", ""):
+                token_ids = [self._tokenize(prefix + category)[:1] for category in categories]
+                if all(token_ids) and len({ids[0] for ids in token_ids}) == len(categories):
+                    self._label_token_cache[key] = [ids[0] for ids in token_ids]
+                    break
+            else:
+                logger.error(f"Labels {categories} share a first token; classification is disabled")
+
+        label_ids = self._label_token_cache[key]
+        if label_ids is None:
+            raise ValueError(f"Labels {categories} cannot be told apart by their first token")
+        return label_ids
+
+    def _tokenize(self, text: str) -> List[int]:
+        """Token ids of a text without special tokens."""
+        if self.model is not None:
+            return self.model.tokenize(text.encode("utf-8"), add_bos=False)
+        return self.generator.tokenizer.encode(text, add_special_tokens=False)
 
     def extract_keywords(self, text: str, max_keywords=5):
         return text.split()[:max_keywords]
 
 
-llm = LLMInterface()
+@cache
+def get_llm() -> LLMInterface:
+    """Get the shared LLMInterface, loading the model on first use."""
+    return LLMInterface()
+
+
+@cache
+def get_token_counter() -> TokenCounter:
+    """Get the shared TokenCounter, loading the tokenizer on first use."""
+    return TokenCounter()
@@ -0,0 +1,65 @@
+"""
+Cross-encoder reranking module using SentenceTransformers (LOCAL MODEL)
+Scores (query, chunk) pairs jointly for a more precise ordering than
+the ANN similarity returned by the vector store.
+"""
+
+from functools import cache
+from typing import List
+
+import numpy as np
+from sentence_transformers import CrossEncoder
+
+from utils.config import config
+from utils.logger import logger
+
+
+class Reranker:
+    """Score query/passage pairs with a local cross-encoder."""
+
+    def __init__(self, model_name: str = None):
+        """
+        Initialize cross-encoder model.
+        An empty model name disables reranking.
+        """
+        self.model_name = config.RERANKER_MODEL if model_name is None else model_name
+        self.batch_size = config.RERANKER_BATCH_SIZE
+        self.model = None
+
+        if not self.model_name:
+            logger.info("Reranker disabled")
+            return
+
+        logger.info(f"Loading reranker model: {self.model_name}")
+        self.model = CrossEncoder(self.model_name)
+
+        logger.info("Reranker model loaded successfully")
+
+    # --------------------------------------------------
+
+    @property
+    def enabled(self) -> bool:
+        return self.model is not None
+
+    # --------------------------------------------------
+
+    def score(self, query: str, texts: List[str]) -> np.ndarray:
+        """Score every text against the query in a single batched forward pass."""
+        try:
+            pairs = [(query, text) for text in texts]
+            scores = self.model.predict(
+                pairs,
+                batch_size=self.batch_size,
+                show_progress_bar=False,
+                convert_to_numpy=True
+            )
+            return np.asarray(scores, dtype=np.float32)
+        except Exception as e:
+            logger.error(f"Rerank error: {e}")
+            raise
+
+
+@cache
+def get_reranker() -> Reranker:
+    """Get the shared Reranker, loading the model on first use."""
+    return Reranker()
@@ -3,8 +3,21 @@ Vector store implementation using Milvus.
 Stable version for sentence-transformers embeddings.
 """
 
-from typing import List, Dict, Any, Optional
+import base64
+import itertools
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Sequence, Tuple, Union
+
+import msgpack
+import numpy as np
+import orjson
 from pymilvus import (
+    BulkInsertState,
     connections,
     Collection,
     CollectionSchema,
@@ -12,28 +25,142 @@ from pymilvus import (
     DataType,
     utility
 )
+from pymilvus.client.types import LoadState
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from minio import Minio
+except ImportError:  # bulk_insert is unavailable; insert() still works
+    pa = pq = Minio = None
 
+from utils.batching import MicroBatcher
+from utils.cache import SemanticCache
 from utils.config import config
 from utils.logger import logger
+from utils.similarity import cosine_scores, similarity_order
+
+BULK_INSERT_AVAILABLE = pq is not None and Minio is not None
+
+
+# Embeddings are taken as numpy arrays, which reach pymilvus without
+# conversion; plain sequences are accepted and converted once
+Vector = Union[np.ndarray, Sequence[float]]
+Matrix = Union[np.ndarray, Sequence[Sequence[float]]]
+
+# Metadata keys duplicated into scalar fields so Milvus can filter on them
+FILTERABLE_FIELDS = ("file_type",)
+
+# Over-fetch used when a filter has to be applied after the search
+OVERFETCH_FACTOR = 4
+OVERFETCH_MIN = 20
+
+# Vectors are unit length (normalized on insert and search), so inner
+# product ranks exactly like cosine without Milvus dividing by norms.
+# Collections created with COSINE keep searching with COSINE.
+METRIC_TYPE = "IP"
+
+# Index build params per supported index type (config.INDEX_TYPE)
+INDEX_BUILD_PARAMS = {
+    "HNSW": {"M": config.HNSW_M, "efConstruction": config.HNSW_EF_CONSTRUCTION},
+    # 384-d vectors split into 48 sub-vectors of 8 bits: 48 bytes per vector
+    "IVF_PQ": {"nlist": 128, "m": 48, "nbits": 8},
+    # Per-dimension int8 scalar quantization: 384 bytes per vector
+    "IVF_SQ8": {"nlist": 128},
+    # GPU indexes need a Milvus GPU image (milvusdb/milvus:*-gpu)
+    "GPU_IVF_FLAT": {"nlist": 1024},
+    "GPU_CAGRA": {"intermediate_graph_degree": 64, "graph_degree": 32},
+}
+
+# GPU index used in place of each CPU index when config.USE_GPU_INDEX is set
+GPU_INDEX_TYPES = {"HNSW": "GPU_CAGRA"}
+GPU_DEFAULT_INDEX_TYPE = "GPU_IVF_FLAT"
+
+# Indexes that keep lossy vector codes; hits are over-fetched and rescored
+# against the stored full-precision vectors to recover recall
+QUANTIZED_INDEX_TYPES = {"IVF_PQ", "IVF_SQ8"}
+QUANTIZED_OVERFETCH_FACTOR = 2
+
+
+def _to_builtin(value: Any) -> Any:
+    """msgpack fallback for numpy values in metadata."""
+    if isinstance(value, (np.generic, np.ndarray)):
+        return value.tolist()
+    raise TypeError(f"Cannot serialize {type(value).__name__} metadata")
+
+
+def _encode_metadata(metadata: Dict[str, Any]) -> str:
+    """Pack metadata as base64 MessagePack for the VARCHAR metadata field."""
+    packed = msgpack.packb(metadata, use_bin_type=True, default=_to_builtin)
+    return base64.b64encode(packed).decode("ascii")
+
+
+def _decode_metadata(raw: Optional[str]) -> Dict[str, Any]:
+    """Unpack a metadata field; rows written before MessagePack hold JSON."""
+    if not raw:
+        return {}
+    if raw[0] == "{":  # never a base64 character
+        return orjson.loads(raw)
+    return msgpack.unpackb(base64.b64decode(raw), raw=False)
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Scale each row to unit L2 norm (zero rows are left as is)."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
 
 
 class VectorStore:
     """Milvus vector store for document embeddings."""
 
-    def __init__(self):
+    def __init__(self, partitions: Optional[List[str]] = None):
+        """
+        Connect to Milvus and make the collection searchable.
+
+        Args:
+            partitions: Partitions to load into memory (None loads all)
+        """
         self.collection_name = config.MILVUS_COLLECTION
+        self.partitions = partitions
         self.dim = config.EMBEDDING_DIM
         self.collection: Optional[Collection] = None
+        self.scalar_fields: List[str] = []
+        self.index_type: str = "HNSW"
+        self.metric_type: str = METRIC_TYPE
+        self.max_lengths: Dict[str, int] = {}
+
+        # One gRPC channel per alias; requests rotate over them so concurrent
+        # callers do not queue on a single connection
+        self.aliases = ["default"] + [
+            f"default_{i}" for i in range(1, max(config.MILVUS_POOL_SIZE, 1))
+        ]
+        self._pool: Iterator[Collection] = iter(())
+
+        # Results of recent searches, reused for near-identical query embeddings
+        self._search_cache = SemanticCache(
+            dim=self.dim,
+            capacity=config.SEARCH_CACHE_SIZE,
+            threshold=config.SEARCH_CACHE_THRESHOLD
+        )
+
+        # Coalesces concurrent asearch() calls into multi-query requests
+        self._search_batcher = MicroBatcher(
+            self._search_requests,
+            max_batch_size=config.SEARCH_MAX_BATCH,
+            max_wait_ms=config.SEARCH_BATCH_WAIT_MS
+        )
 
         try:
-            connections.connect(
-                alias="default",
-                host=config.MILVUS_HOST,
-                port=config.MILVUS_PORT
-            )
+            for alias in self.aliases:
+                connections.connect(
+                    alias=alias,
+                    host=config.MILVUS_HOST,
+                    port=config.MILVUS_PORT
+                )
 
             logger.info(
-                f"Connected to Milvus at {config.MILVUS_HOST}:{config.MILVUS_PORT}"
+                f"Connected to Milvus at {config.MILVUS_HOST}:{config.MILVUS_PORT} "
+                f"({len(self.aliases)} connections)"
             )
 
             self._initialize_collection()
@@ -54,11 +181,75 @@ class VectorStore:
             logger.info(f"Creating new collection: {self.collection_name}")
             self._create_collection()
 
-        self.collection.load()
+        self._load()
+        self._inspect_collection()
+        self._open_pool()
         logger.info("Collection ready")
 
     # -----------------------------------------------------
 
+    def _load(self):
+        """
+        Load the collection (or self.partitions) unless Milvus already has it.
+
+        A warm Milvus keeps collections loaded across app restarts, so the
+        load RPC is skipped then. Collections are never released here.
+        """
+
+        state = utility.load_state(self.collection_name, partition_names=self.partitions)
+        if state == LoadState.Loaded:
+            logger.info(f"Collection {self.collection_name} already loaded")
+            return
+
+        self.collection.load(partition_names=self.partitions)
+
+    # -----------------------------------------------------
+
+    def _open_pool(self):
+        """Open a collection handle on every connection alias."""
+
+        self._pool = itertools.cycle(
+            [self.collection] + [
+                Collection(self.collection_name, using=alias)
+                for alias in self.aliases[1:]
+            ]
+        )
+
+    def _pooled_collection(self) -> Collection:
+        """Next collection handle in round-robin order."""
+
+        return next(self._pool)
+
+    # -----------------------------------------------------
+
+    def _inspect_collection(self):
+        """Record the collection's index type and filterable scalar fields."""
+
+        index_params = self.collection.indexes[0].params if self.collection.indexes else {}
+        self.index_type = index_params.get("index_type", "FLAT")
+        self.metric_type = index_params.get("metric_type", METRIC_TYPE)
+
+        self.scalar_fields = [
+            field.name
+            for field in self.collection.schema.fields
+            if field.name in FILTERABLE_FIELDS
+        ]
+
+        self.max_lengths = {
+            field.name: field.params.get("max_length")
+            for field in self.collection.schema.fields
+            if field.dtype == DataType.VARCHAR
+        }
+
+        missing = set(FILTERABLE_FIELDS) - set(self.scalar_fields)
+        if missing:
+            logger.warning(
+                f"Collection {self.collection_name} has no scalar field(s) "
+                f"{sorted(missing)}; filters on them are applied after the search"
+            )
+
+    # -----------------------------------------------------
+
     def _create_collection(self):
         """Create Milvus collection schema."""
 
@@ -77,12 +268,18 @@ class VectorStore:
             FieldSchema(
                 name="text",
                 dtype=DataType.VARCHAR,
-                max_length=65535
+                # UTF-8 headroom over CHUNK_SIZE characters
+                max_length=min(config.CHUNK_SIZE * 4, 65535)
             ),
             FieldSchema(
                 name="metadata",
                 dtype=DataType.VARCHAR,
-                max_length=65535
+                max_length=4096
+            ),
+            FieldSchema(
+                name="file_type",
+                dtype=DataType.VARCHAR,
+                max_length=16
             ),
         ]
 
@@ -96,10 +293,32 @@ class VectorStore:
             schema=schema
         )
 
+        index_type = config.INDEX_TYPE
+        if index_type not in INDEX_BUILD_PARAMS:
+            logger.warning(f"Unsupported index type {index_type}, using HNSW")
+            index_type = "HNSW"
+
+        if config.USE_GPU_INDEX and not index_type.startswith("GPU_"):
+            index_type = GPU_INDEX_TYPES.get(index_type, GPU_DEFAULT_INDEX_TYPE)
+
+        try:
+            self._create_index(index_type)
+        except Exception as e:
+            if not index_type.startswith("GPU_"):
+                raise
+            # A CPU-only Milvus rejects GPU indexes
+            logger.warning(f"Could not build {index_type} index ({e}), using HNSW")
+            self._create_index("HNSW")
+
+        logger.info("Collection created with index")
+
+    def _create_index(self, index_type: str):
+        """Build the vector index on the embedding field."""
+
         index_params = {
-            "metric_type": "COSINE",
-            "index_type": "IVF_FLAT",
-            "params": {"nlist": 128}
+            "metric_type": METRIC_TYPE,
+            "index_type": index_type,
+            "params": INDEX_BUILD_PARAMS[index_type]
         }
 
         self.collection.create_index(
@@ -107,92 +326,617 @@ class VectorStore:
             index_params=index_params
         )
 
-        logger.info("Collection created with index")
-
     # -----------------------------------------------------
 
     def insert(
         self,
         texts: List[str],
-        embeddings: List[List[float]],
-        metadatas: List[Dict[str, Any]]
+        embeddings: Matrix,
+        metadatas: Union[Dict[str, Sequence[Any]], List[Dict[str, Any]]],
+        flush: bool = False
     ) -> bool:
+        """
+        Insert chunks with their embeddings.
+
+        embeddings may be an (n, dim) array or a list of vectors; either
+        is converted to one contiguous float32 array so pymilvus never
+        walks Python floats, and rows are L2-normalized as the IP metric
+        requires. metadatas may be columnar
+        (field name -> one value per chunk) or a list of per-chunk dicts.
+
+        Milvus flushes on its own, so batches are not flushed unless
+        flush is set; bulk loads call finalize() once at the end instead.
+
+        The insert is all-or-nothing: if any slice fails, the rows of the
+        slices that succeeded are deleted again before returning False.
+        """
 
         try:
-            if not texts:
+            data = self._build_columns(texts, embeddings, metadatas)
+            if data is None:
                 return False
+            texts = data[1]
 
-            if not (len(texts) == len(embeddings) == len(metadatas)):
-                logger.error("Length mismatch in insert data")
-                return False
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Inserting {len(texts)} docs into Milvus")
 
-            import json
-            metadata_strs = [json.dumps(m) for m in metadatas]
+            # Column-wise slices keep each request under the gRPC message
+            # limit; they are sent concurrently over the connection pool
+            batch_size = max(config.INSERT_BATCH_SIZE, 1)
+            futures, inserted, errors = [], [], []
+            for start in range(0, len(texts), batch_size):
+                try:
+                    futures.append(self._pooled_collection().insert(
+                        [column[start:start + batch_size] for column in data],
+                        _async=True
+                    ))
+                except Exception as e:
+                    errors.append(e)
+                    break
 
-            data = [
-                embeddings,
-                texts,
-                metadata_strs
-            ]
+            for future in futures:
+                try:
+                    inserted.append(future.result().primary_keys)
+                except Exception as e:
+                    errors.append(e)
 
-            logger.info(f"Inserting {len(texts)} docs into Milvus")
+            if errors:
+                self._rollback_insert(inserted)
+                raise errors[0]
 
-            self.collection.insert(data)
-            self.collection.flush()
+            if flush:
+                self.collection.flush()
+            self._search_cache.clear()
 
-            logger.info("Insert successful")
+            logger.debug("Insert successful")
             return True
 
         except Exception as e:
             logger.error(f"Insertion failed: {e}")
             return False
 
+    def _rollback_insert(self, primary_keys: List[List[int]]) -> None:
+        """Delete the rows of the insert slices that succeeded."""
+
+        for keys in primary_keys:
+            try:
+                self.collection.delete(f"id in {list(keys)}")
+            except Exception as e:
+                logger.error(f"Could not roll back {len(keys)} inserted rows: {e}")
+
+        if primary_keys:
+            logger.warning(f"Rolled back {sum(len(k) for k in primary_keys)} rows of a failed insert")
+
+    # -----------------------------------------------------
+
+    def _build_columns(
+        self,
+        texts: List[str],
+        embeddings: Matrix,
+        metadatas: Union[Dict[str, Sequence[Any]], List[Dict[str, Any]]]
+    ) -> Optional[List[Any]]:
+        """
+        Turn chunks into insert columns in schema order (embedding, text,
+        metadata, scalar fields), or None if there is nothing valid to insert.
+        """
+
+        if not texts:
+            return None
+
+        embeddings = _normalize_rows(np.ascontiguousarray(embeddings, dtype=np.float32))
+
+        if isinstance(metadatas, dict):
+            columns = {
+                key: np.asarray(values).tolist()
+                for key, values in metadatas.items()
+            }
+            if any(len(values) != len(texts) for values in columns.values()):
+                logger.error("Length mismatch in insert data")
+                return None
+
+            keys = list(columns)
+            metadata_strs = (
+                [_encode_metadata(dict(zip(keys, row))) for row in zip(*columns.values())]
+                if columns else [_encode_metadata({})] * len(texts)
+            )
+            field_values = lambda field: [
+                str(v) for v in columns.get(field, [""] * len(texts))
+            ]
+        else:
+            metadata_strs = [_encode_metadata(m) for m in metadatas]
+            field_values = lambda field: [str(m.get(field, "")) for m in metadatas]
+
+        if not (len(texts) == len(embeddings) == len(metadata_strs)):
+            logger.error("Length mismatch in insert data")
+            return None
+
+        data = [
+            embeddings,
+            texts,
+            metadata_strs
+        ]
+
+        for field in self.scalar_fields:
+            data.append(field_values(field))
+
+        # Milvus rejects a whole request over one over-long value
+        data, dropped = self._fit_varchar_limits(
+            ["embedding", "text", "metadata", *self.scalar_fields],
+            data
+        )
+        if dropped:
+            logger.warning(f"Skipping {dropped} chunks whose metadata is too long")
+
+        return data if len(data[1]) else None
+
+    # -----------------------------------------------------
+
+    def bulk_insert(
+        self,
+        texts: List[str],
+        embeddings: Matrix,
+        metadatas: Union[Dict[str, Sequence[Any]], List[Dict[str, Any]]],
+        parquet_path: Optional[str] = None
+    ) -> bool:
+        """
+        Load chunks through Milvus bulk import instead of streaming inserts.
+
+        The columns are written to one LZ4-compressed parquet file, uploaded
+        to the object store backing Milvus (MINIO_* settings) and imported
+        with a single do_bulk_insert call. Needs pyarrow and minio.
+
+        Args:
+            texts: Chunk texts
+            embeddings: One vector per chunk
+            metadatas: Columnar or per-chunk metadata, as for insert()
+            parquet_path: Where to write the file (a temp file by default)
+
+        Returns:
+            True once Milvus reports the import completed
+        """
+
+        if not BULK_INSERT_AVAILABLE:
+            logger.warning("pyarrow and minio are required for bulk insert")
+            return False
+
+        object_name = f"bulk_insert/{uuid.uuid4().hex}.parquet"
+        client = None
+        task_id = None
+        finished = False
+
+        try:
+            data = self._build_columns(texts, embeddings, metadatas)
+            if data is None:
+                return False
+
+            embeddings = data[0]
+            num_rows, dim = embeddings.shape
+
+            # The vectors become one list<float> column over the same buffer
+            vectors = pa.ListArray.from_arrays(
+                pa.array(np.arange(0, num_rows * dim + 1, dim, dtype=np.int32)),
+                pa.array(embeddings.ravel())
+            )
+            names = ["embedding", "text", "metadata", *self.scalar_fields]
+            table = pa.table([vectors, *data[1:]], names=names)
+
+            with tempfile.TemporaryDirectory(prefix="milvus_bulk_") as temp_dir:
+                path = parquet_path or os.path.join(temp_dir, "chunks.parquet")
+                pq.write_table(table, path, compression="lz4")
+
+                client = Minio(
+                    config.MINIO_ENDPOINT,
+                    access_key=config.MINIO_ACCESS_KEY,
+                    secret_key=config.MINIO_SECRET_KEY,
+                    secure=config.MINIO_SECURE
+                )
+                client.fput_object(config.MINIO_BUCKET, object_name, path)
+
+            task_id = utility.do_bulk_insert(
+                collection_name=self.collection_name,
+                files=[object_name]
+            )
+            logger.info(f"Bulk inserting {num_rows} docs (task {task_id})")
+
+            deadline = time.monotonic() + config.BULK_INSERT_TIMEOUT
+            while time.monotonic() < deadline:
+                state = utility.get_bulk_insert_state(task_id)
+                if state.state == BulkInsertState.ImportCompleted:
+                    finished = True
+                    self._search_cache.clear()
+                    logger.info("Bulk insert completed")
+                    return True
+                if state.state in (
+                    BulkInsertState.ImportFailed,
+                    BulkInsertState.ImportFailedAndCleaned
+                ):
+                    finished = True
+                    logger.error(f"Bulk insert failed: {state.failed_reason}")
+                    return False
+                time.sleep(1)
+
+            logger.error(
+                f"Bulk insert task {task_id} did not finish in time; it may still "
+                f"complete, keeping {object_name} for it"
+            )
+            return False
+
+        except Exception as e:
+            logger.error(f"Bulk insert failed: {e}")
+            return False
+
+        finally:
+            # Milvus reads the staged file until the task is terminal; removing
+            # it earlier would fail an import that may still be running
+            if client is not None and (task_id is None or finished):
+                try:
+                    client.remove_object(config.MINIO_BUCKET, object_name)
+                except Exception as e:
+                    logger.warning(f"Could not remove staged file {object_name}: {e}")
+
+    # -----------------------------------------------------
+
+    def _fit_varchar_limits(
+        self,
+        names: List[str],
+        columns: List[Any]
+    ) -> Tuple[List[Any], int]:
+        """
+        Make string columns fit their VARCHAR max_length (in UTF-8 bytes).
+
+        Over-long text and scalar values are truncated. Rows with
+        over-long metadata are dropped, since cutting it would corrupt it.
+
+        Returns:
+            The adjusted columns and the number of dropped rows
+        """
+
+        columns = list(columns)
+        dropped = set()
+
+        for c, name in enumerate(names):
+            limit = self.max_lengths.get(name)
+            if not limit:
+                continue
+
+            # A string of n characters is at most 4n bytes in UTF-8
+            values = columns[c]
+            over = [
+                i for i, value in enumerate(values)
+                if len(value) * 4 > limit and len(value.encode("utf-8")) > limit
+            ]
+            if not over:
+                continue
+
+            if name == "metadata":
+                dropped.update(over)
+                continue
+
+            logger.warning(f"Truncating {len(over)} {name} values to {limit} bytes")
+            values = list(values)
+            for i in over:
+                values[i] = values[i].encode("utf-8")[:limit].decode("utf-8", "ignore")
+            columns[c] = values
+
+        if dropped:
+            keep = [i for i in range(len(columns[0])) if i not in dropped]
+            columns = [
+                column[keep] if isinstance(column, np.ndarray) else [column[i] for i in keep]
+                for column in columns
+            ]
+
+        return columns, len(dropped)
+
     # -----------------------------------------------------
 
     def search(
         self,
-        query_embedding: List[float],
+        query_embedding: Vector,
         top_k: int = None,
-        filter_dict: Optional[Dict[str, Any]] = None
+        filter_dict: Optional[Dict[str, Any]] = None,
+        ef_search: Optional[int] = None,
+        return_metadata: bool = True
     ) -> List[Dict[str, Any]]:
+        """
+        Search for the chunks closest to a query embedding.
+
+        ef_search sets the HNSW (or GPU_CAGRA) search breadth (higher =
+        better recall, slower); it is ignored for other index types. With return_metadata
+        off, results carry an empty metadata dict and the metadata field is
+        neither fetched nor decoded (unless a filter needs it). A query whose
+        embedding is close enough to a recent one with the same arguments
+        is answered from the search cache without calling Milvus.
+        """
+
+        return self.search_batch(
+            [query_embedding], top_k, filter_dict, ef_search, return_metadata
+        )[0]
+
+    # -----------------------------------------------------
+
+    def search_batch(
+        self,
+        query_embeddings: Matrix,
+        top_k: int = None,
+        filter_dict: Optional[Dict[str, Any]] = None,
+        ef_search: Optional[int] = None,
+        return_metadata: bool = True
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Search for several query embeddings in a single Milvus request.
+
+        Takes the same arguments as search() and returns one result list
+        per query, in order. Cached queries are left out of the request.
+        """
 
         try:
             if top_k is None:
                 top_k = config.TOP_K
 
-            search_params = {
-                "metric_type": "COSINE",
-                "params": {"nprobe": 10}
-            }
+            params_key = self._params_key(top_k, filter_dict, ef_search, return_metadata)
+
+            results: List[Optional[List[Dict[str, Any]]]] = [None] * len(query_embeddings)
+            misses = []
+
+            for i, query_embedding in enumerate(query_embeddings):
+                # Keyed by the search arguments, so an entry cached for other
+                # arguments can never shadow this one
+                cached = self._search_cache.get(query_embedding, key=params_key)
+                if cached is not None:
+                    results[i] = [dict(r) for r in cached]
+                else:
+                    misses.append(i)
+
+            if not misses:
+                return results
+
+            expr, post_filter = self._build_filter_expr(filter_dict)
 
-            results = self.collection.search(
-                data=[query_embedding],
-                anns_field="embedding",
-                param=search_params,
-                limit=top_k,
-                output_fields=["text", "metadata"]
+            # Filters Milvus cannot apply are checked here instead; over-fetch
+            # so that enough matching chunks survive the Python-side filter.
+            limit = max(top_k * OVERFETCH_FACTOR, OVERFETCH_MIN) if post_filter else top_k
+
+            rescore = self.index_type in QUANTIZED_INDEX_TYPES
+            with_metadata = return_metadata or bool(post_filter)
+            output_fields = ["text", "metadata"] if with_metadata else ["text"]
+            if rescore:
+                limit *= QUANTIZED_OVERFETCH_FACTOR
+                output_fields.append("embedding")
+
+            search_params = self._search_params(limit, ef_search)
+
+            data = _normalize_rows(
+                np.ascontiguousarray([query_embeddings[i] for i in misses], dtype=np.float32)
             )
 
-            import json
-            formatted = []
+            # Concurrent asearch() calls arrive here as one batch; when they
+            # need several requests, similar queries share a request so they
+            # probe the same index regions
+            group_size = max(config.SEARCH_GROUP_SIZE, 1)
+            if len(misses) > group_size:
+                order = similarity_order(data)
+                data = data[order]
+                misses = [misses[j] for j in order]
+
+            # All requests are issued before any is awaited
+            futures = [
+                self._pooled_collection().search(
+                    data=list(data[start:start + group_size]),
+                    anns_field="embedding",
+                    param=search_params,
+                    limit=limit,
+                    expr=expr,
+                    output_fields=output_fields,
+                    _async=True
+                )
+                for start in range(0, len(misses), group_size)
+            ]
+            hits_per_query = [hits for future in futures for hits in future.result()]
+
+            # Milvus returns one hit list per query vector, in request order
+            for i, hits in zip(misses, hits_per_query):
+                formatted = self._format_hits(hits, with_metadata, rescore)
+
+                if post_filter:
+                    formatted = [
+                        r for r in formatted
+                        if self._matches_filter(r["metadata"], post_filter)
+                    ]
 
-            for hits in results:
-                for hit in hits:
-                    metadata_raw = hit.entity.get("metadata")
-                    metadata = json.loads(metadata_raw) if metadata_raw else {}
+                if rescore:
+                    formatted = self._rescore_exact(query_embeddings[i], formatted)
 
-                    formatted.append({
-                        "text": hit.entity.get("text"),
-                        "metadata": metadata,
-                        "score": float(hit.score)
-                    })
+                formatted = formatted[:top_k]
+                if with_metadata and not return_metadata:
+                    for r in formatted:
+                        r["metadata"] = {}
+                self._search_cache.set(query_embeddings[i], formatted, key=params_key)
+                results[i] = [dict(r) for r in formatted]
 
-            logger.info(f"Retrieved {len(formatted)} results")
-            return formatted
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    f"Retrieved {sum(len(r) for r in results)} results "
+                    f"for {len(query_embeddings)} queries ({len(misses)} searched)"
+                )
+            return results
 
         except Exception as e:
             logger.error(f"Search failed: {e}")
-            return []
+            return [[] for _ in query_embeddings]
+
+    # -----------------------------------------------------
+
+    async def asearch(
+        self,
+        query_embedding: Vector,
+        top_k: int = None,
+        filter_dict: Optional[Dict[str, Any]] = None,
+        ef_search: Optional[int] = None,
+        return_metadata: bool = True
+    ) -> List[Dict[str, Any]]:
+        """
+        Async variant of search().
+
+        Concurrent calls arriving within a few milliseconds are sent to
+        Milvus together, one request per distinct set of arguments.
+        """
+
+        return await self._search_batcher.submit(
+            (query_embedding, top_k, filter_dict, ef_search, return_metadata)
+        )
+
+    def _search_requests(self, requests: List[tuple]) -> List[List[Dict[str, Any]]]:
+        """Batch function for asearch: group requests by arguments and search each group."""
+
+        groups: Dict[tuple, List[int]] = {}
+        for i, (_, *params) in enumerate(requests):
+            groups.setdefault(self._params_key(*params), []).append(i)
+
+        results: List[Optional[List[Dict[str, Any]]]] = [None] * len(requests)
+        for indices in groups.values():
+            _, *params = requests[indices[0]]
+            batch = self.search_batch([requests[i][0] for i in indices], *params)
+            for i, result in zip(indices, batch):
+                results[i] = result
+
+        return results
+
+    @staticmethod
+    def _params_key(
+        top_k: Optional[int],
+        filter_dict: Optional[Dict[str, Any]],
+        ef_search: Optional[int],
+        return_metadata: bool = True
+    ) -> tuple:
+        """Hashable form of the search arguments other than the query."""
+
+        return (
+            top_k,
+            ef_search,
+            return_metadata,
+            orjson.dumps(filter_dict, option=orjson.OPT_SORT_KEYS, default=str)
+        )
+
+    @staticmethod
+    def _format_hits(
+        hits: Iterable[Any],
+        with_metadata: bool,
+        with_embedding: bool
+    ) -> List[Dict[str, Any]]:
+        """Turn one query's Milvus hits into result dicts."""
+
+        hits = list(hits)
+        formatted = [
+            {
+                "text": hit.entity.get("text"),
+                "metadata": _decode_metadata(hit.entity.get("metadata")) if with_metadata else {},
+                "score": float(hit.score)
+            }
+            for hit in hits
+        ]
+
+        if with_embedding:
+            for result, hit in zip(formatted, hits):
+                result["embedding"] = hit.entity.get("embedding")
+
+        return formatted
+
+    # -----------------------------------------------------
+
+    @staticmethod
+    def _rescore_exact(
+        query_embedding: Vector,
+        results: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Replace approximate scores with exact cosine similarity and re-sort."""
+
+        if not results:
+            return results
+
+        vectors = [r.pop("embedding") for r in results]
+        scores = cosine_scores(query_embedding, vectors)
+
+        for result, score in zip(results, scores):
+            result["score"] = float(score)
+
+        order = np.argsort(-scores, kind="stable")
+        return [results[i] for i in order]
+
+    # -----------------------------------------------------
+
+    def _search_params(
+        self,
+        limit: int,
+        ef_search: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Build search params matching the collection's index type."""
+
+        if self.index_type == "HNSW":
+            # Milvus requires ef >= limit
+            params = {"ef": max(ef_search or config.HNSW_EF, limit)}
+        elif self.index_type == "GPU_CAGRA":
+            # CAGRA keeps itopk_size candidates and needs at least limit
+            params = {"itopk_size": max(ef_search or config.HNSW_EF, limit)}
+        elif self.index_type == "GPU_IVF_FLAT":
+            params = {"nprobe": 16}
+        else:
+            params = {"nprobe": 10}
+
+        return {
+            "metric_type": self.metric_type,
+            "params": params
+        }
+
+    # -----------------------------------------------------
+
+    def _build_filter_expr(
+        self,
+        filter_dict: Optional[Dict[str, Any]]
+    ) -> Tuple[Optional[str], Dict[str, Any]]:
+        """
+        Translate a metadata filter into a Milvus boolean expression.
+
+        List values become `in` clauses, scalars become equality checks.
+        Keys without a scalar field in this collection cannot be pushed
+        down and are returned separately for Python-side filtering.
+        """
+
+        if not filter_dict:
+            return None, {}
+
+        clauses = []
+        post_filter = {}
+
+        for key, value in filter_dict.items():
+            if key not in self.scalar_fields:
+                post_filter[key] = value
+                continue
+
+            if isinstance(value, (list, tuple, set)):
+                values = ", ".join(orjson.dumps(str(v)).decode() for v in value)
+                clauses.append(f"{key} in [{values}]")
+            else:
+                clauses.append(f"{key} == {orjson.dumps(str(value)).decode()}")
+
+        return " and ".join(clauses) or None, post_filter
+
+    # -----------------------------------------------------
+
+    @staticmethod
+    def _matches_filter(
+        metadata: Dict[str, Any],
+        filter_dict: Dict[str, Any]
+    ) -> bool:
+        """Check a result's metadata against a filter dict."""
+
+        for key, value in filter_dict.items():
+            if isinstance(value, (list, tuple, set)):
+                if metadata.get(key) not in value:
+                    return False
+            elif metadata.get(key) != value:
+                return False
+
+        return True
 
     # -----------------------------------------------------
 
@@ -205,7 +949,10 @@ class VectorStore:
                 logger.info("Collection dropped")
 
             self._create_collection()
-            self.collection.load()
+            self._load()
+            self._inspect_collection()
+            self._open_pool()
+            self._search_cache.clear()
 
             return True
 
@@ -215,14 +962,26 @@ class VectorStore:
 
     # -----------------------------------------------------
 
-    def get_stats(self) -> Dict[str, Any]:
+    def finalize(self) -> bool:
+        """Flush once after a bulk load so new chunks are sealed and counted."""
 
         try:
             self.collection.flush()
+            return True
 
+        except Exception as e:
+            logger.error(f"Flush failed: {e}")
+            return False
+
+    # -----------------------------------------------------
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Collection name, row count and vector dimension."""
+
+        try:
             return {
                 "collection": self.collection_name,
-                "documents": self.collection.num_entities,
+                "documents": self._count_entities(),
                 "dimension": self.dim
             }
 
@@ -230,12 +989,37 @@ class VectorStore:
             logger.error(f"Stats error: {e}")
             return {}
 
+    def _count_entities(self) -> int:
+        """
+        Row count without forcing a flush.
+
+        Loaded segment info includes growing (unflushed) segments;
+        num_entities only counts sealed ones and is the fallback.
+        """
+
+        try:
+            segments = utility.get_query_segment_info(self.collection_name)
+            return sum(segment.num_rows for segment in segments)
+        except Exception:
+            return self.collection.num_entities
+
     # -----------------------------------------------------
 
     def close(self):
-        connections.disconnect("default")
+        for alias in self.aliases:
+            connections.disconnect(alias)
         logger.info("Milvus disconnected")
 
 
-# Singleton
-vector_store = VectorStore()
+_instance: Optional[VectorStore] = None
+_instance_lock = threading.Lock()
+
+
+def get_vector_store() -> VectorStore:
+    """Get the shared VectorStore, connecting to Milvus on first use."""
+    global _instance
+    if _instance is None:
+        with _instance_lock:
+            if _instance is None:
+                _instance = VectorStore()
+    return _instance
@@ -2,5 +2,6 @@
 
 from .config import config, Config
 from .logger import logger, setup_logger
+from .cache import LRUCache, SemanticCache, hash_key
 
-__all__ = ['config', 'Config', 'logger', 'setup_logger']
+__all__ = ['config', 'Config', 'logger', 'setup_logger', 'LRUCache', 'SemanticCache', 'hash_key']
@@ -0,0 +1,98 @@
+"""Async micro-batching for the Agentic RAG System."""
+
+import asyncio
+import weakref
+from typing import Any, Callable, List, Sequence
+
+
+class MicroBatcher:
+    """Coalesce concurrent single-item requests into one batched call."""
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], Sequence[Any]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0
+    ):
+        """
+        Initialize micro-batcher.
+
+        Args:
+            batch_fn: Blocking function mapping a list of items to a list
+                of results in the same order
+            max_batch_size: Flush as soon as this many items are pending
+            max_wait_ms: Longest time the first pending item waits for
+                company while another batch is running; an idle batcher
+                flushes immediately
+        """
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+
+        # Pending state is kept per event loop, since futures are loop-bound
+        self._pending: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self._timers: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self._running: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self._tasks: set = set()
+
+    async def submit(self, item: Any) -> Any:
+        """
+        Queue an item and wait for its result.
+
+        Args:
+            item: Single input for batch_fn
+
+        Returns:
+            The result batch_fn produced for this item
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        pending = self._pending.setdefault(loop, [])
+        pending.append((item, future))
+
+        # An idle batcher has nothing to wait for: run the item at once and
+        # let requests arriving meanwhile gather into the next batch
+        if len(pending) >= self.max_batch_size or not self._running.get(loop):
+            self._flush(loop)
+        elif loop not in self._timers:
+            self._timers[loop] = loop.call_later(
+                self.max_wait_ms / 1000, self._flush, loop
+            )
+
+        return await future
+
+    def _flush(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Hand the pending batch for a loop to a worker task."""
+        timer = self._timers.pop(loop, None)
+        if timer is not None:
+            timer.cancel()
+
+        batch = self._pending.pop(loop, None)
+        if batch:
+            self._running[loop] = self._running.get(loop, 0) + 1
+            task = loop.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[tuple]) -> None:
+        """Execute one batch off the event loop and resolve its futures."""
+        items = [item for item, _ in batch]
+
+        try:
+            results = await asyncio.to_thread(self.batch_fn, items)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            # Items queued while this batch ran go out now, not on the timer
+            loop = asyncio.get_running_loop()
+            self._running[loop] -= 1
+            if not self._running[loop] and self._pending.get(loop):
+                self._flush(loop)
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
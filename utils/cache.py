@@ -0,0 +1,252 @@
+"""In-process caching helpers for the Agentic RAG System."""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Union
+
+import numpy as np
+
+
+def hash_key(text: str) -> str:
+    """
+    Build a stable cache key for a text value.
+
+    Args:
+        text: Text to hash
+
+    Returns:
+        Hex SHA-256 digest of the text
+    """
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class LRUCache:
+    """Thread-safe LRU cache with optional per-entry TTL."""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        """
+        Initialize LRU cache.
+
+        Args:
+            maxsize: Maximum number of entries kept
+            ttl: Seconds an entry stays valid (None disables expiry)
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Look up a cached value.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Cached value, or None on a miss or expired entry
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                self._misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Store a value, evicting the least recently used entry when full.
+
+        Args:
+            key: Cache key
+            value: Value to cache
+        """
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all cached entries."""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics.
+
+        Returns:
+            Dict with size, hits, misses and hit rate
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / lookups if lookups else 0.0
+            }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SemanticCache:
+    """
+    Thread-safe approximate cache keyed by embedding similarity.
+
+    Embeddings are kept L2-normalized in a preallocated float32 matrix, so a
+    lookup is a single matrix-vector product. Entries are evicted FIFO.
+    An optional exact key partitions the cache: a lookup only matches
+    entries stored under the same key.
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        capacity: int = 256,
+        threshold: float = 0.97,
+        ttl: Optional[float] = None
+    ):
+        """
+        Initialize semantic cache.
+
+        Args:
+            dim: Embedding dimension
+            capacity: Maximum number of entries kept
+            threshold: Minimum cosine similarity for a hit
+            ttl: Seconds an entry stays valid (None disables expiry)
+        """
+        self.dim = dim
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl = ttl
+        self._vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self._expires = np.full(capacity, np.inf)
+        self._values: List[Any] = [None] * capacity
+        self._keys: List[Hashable] = [None] * capacity
+        self._size = 0
+        self._next = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def _normalize(embedding: Union[Sequence[float], np.ndarray]) -> Optional[np.ndarray]:
+        """Return the embedding as a unit-length float32 vector."""
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return None
+        return vector / norm
+
+    def get(
+        self,
+        embedding: Union[Sequence[float], np.ndarray],
+        key: Hashable = None
+    ) -> Optional[Any]:
+        """
+        Look up the value cached for the most similar embedding.
+
+        Args:
+            embedding: Query embedding
+            key: Only entries stored under this exact key can match
+
+        Returns:
+            Cached value if the best match clears the threshold, else None
+        """
+        vector = self._normalize(embedding)
+
+        with self._lock:
+            if vector is None or self._size == 0:
+                self._misses += 1
+                return None
+
+            similarities = self._vectors[:self._size] @ vector
+            similarities[np.fromiter(
+                (k != key for k in self._keys[:self._size]),
+                dtype=bool,
+                count=self._size
+            )] = -np.inf
+            if self.ttl:
+                similarities[self._expires[:self._size] < time.monotonic()] = -np.inf
+
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self._misses += 1
+                return None
+
+            self._hits += 1
+            return self._values[best]
+
+    def set(
+        self,
+        embedding: Union[Sequence[float], np.ndarray],
+        value: Any,
+        key: Hashable = None
+    ) -> None:
+        """
+        Cache a value under an embedding, overwriting the oldest entry when full.
+
+        Args:
+            embedding: Query embedding
+            value: Value to cache
+            key: Exact key the entry is stored under (see get)
+        """
+        vector = self._normalize(embedding)
+        if vector is None:
+            return
+
+        with self._lock:
+            slot = self._next
+            self._vectors[slot] = vector
+            self._values[slot] = value
+            self._keys[slot] = key
+            self._expires[slot] = time.monotonic() + self.ttl if self.ttl else np.inf
+            self._next = (slot + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+
+    def clear(self) -> None:
+        """Drop all cached entries."""
+        with self._lock:
+            self._values = [None] * self.capacity
+            self._keys = [None] * self.capacity
+            self._expires.fill(np.inf)
+            self._size = 0
+            self._next = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics.
+
+        Returns:
+            Dict with size, hits, misses and hit rate
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'size': self._size,
+                'capacity': self.capacity,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / lookups if lookups else 0.0
+            }
+
+    def __len__(self) -> int:
+        return self._size
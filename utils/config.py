@@ -1,6 +1,7 @@
 """Configuration management for the Agentic RAG System."""
 
 import os
+from dataclasses import dataclass
 from typing import Optional
 from dotenv import load_dotenv
 
@@ -8,8 +9,14 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
+@dataclass(frozen=True, slots=True)
 class Config:
-    """Configuration class for the application."""
+    """
+    Configuration class for the application.
+
+    Values are read from the environment once, at import time; the
+    instance is immutable and attributes are slots.
+    """
     
     # API Keys
     GOOGLE_API_KEY: str = os.getenv("GOOGLE_API_KEY", "")
@@ -18,31 +25,88 @@ class Config:
     MILVUS_HOST: str = os.getenv("MILVUS_HOST", "localhost")
     MILVUS_PORT: int = int(os.getenv("MILVUS_PORT", "19530"))
     MILVUS_COLLECTION: str = os.getenv("MILVUS_COLLECTION", "document_collection")
+    MILVUS_POOL_SIZE: int = int(os.getenv("MILVUS_POOL_SIZE", "4"))  # gRPC connections used round-robin
+    INSERT_BATCH_SIZE: int = int(os.getenv("INSERT_BATCH_SIZE", "1000"))  # rows per insert request
+    BULK_INSERT_MIN_ROWS: int = int(os.getenv("BULK_INSERT_MIN_ROWS", "50000"))  # larger uploads go through parquet bulk import
+    BULK_INSERT_TIMEOUT: float = float(os.getenv("BULK_INSERT_TIMEOUT", "600"))
+    
+    # Object store backing Milvus (bulk import reads files from it)
+    MINIO_ENDPOINT: str = os.getenv("MINIO_ENDPOINT", "localhost:9000")
+    MINIO_ACCESS_KEY: str = os.getenv("MINIO_ACCESS_KEY", "minioadmin")
+    MINIO_SECRET_KEY: str = os.getenv("MINIO_SECRET_KEY", "minioadmin")
+    MINIO_BUCKET: str = os.getenv("MINIO_BUCKET", "a-bucket")
+    MINIO_SECURE: bool = os.getenv("MINIO_SECURE", "0") == "1"
     
     # Model Configuration
     EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "models/embedding-001")
     LLM_MODEL: str = os.getenv("LLM_MODEL", "gemini-1.5-flash-latest")
 
     
+    # Local LLM Configuration (a GGUF path switches generation to llama.cpp)
+    LLM_HF_MODEL: str = os.getenv("LLM_HF_MODEL", "Qwen/Qwen2.5-0.5B-Instruct")
+    LLM_LOAD_IN_4BIT: bool = os.getenv("LLM_LOAD_IN_4BIT", "1") == "1"  # needs CUDA + bitsandbytes
+    LLM_COMPILE: bool = os.getenv("LLM_COMPILE", "0") == "1"
+    LLM_GGUF_PATH: str = os.getenv("LLM_GGUF_PATH", "")
+    LLM_CONTEXT_SIZE: int = int(os.getenv("LLM_CONTEXT_SIZE", "2048"))  # prompt + answer window, capped by the model's own limit
+    LLM_THREADS: int = int(os.getenv("LLM_THREADS", "0"))  # 0 uses every core
+    CONTEXT_TOKEN_BUDGET: int = int(os.getenv("CONTEXT_TOKEN_BUDGET", "0"))  # retrieved-context tokens per prompt; 0 derives it from the context window
+    
     # Embedding Dimensions
-    EMBEDDING_DIM: int = 384  # Google embedding dimension
+    EMBEDDING_DIM: int = 384  # all-MiniLM-L6-v2 output size, checked when the model loads
+    EMBEDDING_COMPILE: bool = os.getenv("EMBEDDING_COMPILE", "1") == "1"
+    EMBEDDING_ONNX_DIR: str = os.getenv("EMBEDDING_ONNX_DIR", "./minilm-onnx")  # INT8 ONNX encoder on CPU; empty disables
     
     # Chunk Configuration
     CHUNK_SIZE: int = int(os.getenv("CHUNK_SIZE", "1000"))
     CHUNK_OVERLAP: int = int(os.getenv("CHUNK_OVERLAP", "200"))
     
+    # Index Configuration (HNSW, IVF_SQ8 / IVF_PQ for a compressed in-memory index, or GPU_IVF_FLAT / GPU_CAGRA)
+    INDEX_TYPE: str = os.getenv("INDEX_TYPE", "HNSW").upper()
+    USE_GPU_INDEX: bool = os.getenv("USE_GPU_INDEX", "0") == "1"  # GPU_CAGRA / GPU_IVF_FLAT; needs the Milvus GPU image
+    HNSW_M: int = int(os.getenv("HNSW_M", "16"))
+    HNSW_EF_CONSTRUCTION: int = int(os.getenv("HNSW_EF_CONSTRUCTION", "200"))
+    HNSW_EF: int = int(os.getenv("HNSW_EF", "64"))  # default search breadth (raised to top_k when smaller)
+    
     # Retrieval Configuration
     TOP_K: int = int(os.getenv("TOP_K", "5"))
     SIMILARITY_THRESHOLD: float = float(os.getenv("SIMILARITY_THRESHOLD", "0.7"))
     
+    # Reranking Configuration (empty RERANKER_MODEL disables the cross-encoder)
+    RERANKER_MODEL: str = os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+    RERANKER_BATCH_SIZE: int = int(os.getenv("RERANKER_BATCH_SIZE", "32"))
+    RERANK_CANDIDATE_FACTOR: int = int(os.getenv("RERANK_CANDIDATE_FACTOR", "5"))
+    DEDUP_SIMILARITY_THRESHOLD: float = float(os.getenv("DEDUP_SIMILARITY_THRESHOLD", "0.9"))
+    
+    # Cache Configuration
+    EMBEDDING_CACHE_SIZE: int = int(os.getenv("EMBEDDING_CACHE_SIZE", "1024"))
+    EMBEDDING_CACHE_TTL: float = float(os.getenv("EMBEDDING_CACHE_TTL", "3600"))
+    ANSWER_CACHE_SIZE: int = int(os.getenv("ANSWER_CACHE_SIZE", "256"))
+    ANSWER_CACHE_TTL: float = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+    SEMANTIC_CACHE_THRESHOLD: float = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.97"))
+    EMBEDDING_DISK_CACHE_DIR: str = os.getenv("EMBEDDING_DISK_CACHE_DIR", "/tmp/emb_cache")  # empty keeps chunk embeddings in memory
+    CHUNK_EMBEDDING_CACHE_SIZE: int = int(os.getenv("CHUNK_EMBEDDING_CACHE_SIZE", "20000"))
+    SEARCH_CACHE_SIZE: int = int(os.getenv("SEARCH_CACHE_SIZE", "256"))
+    SEARCH_CACHE_THRESHOLD: float = float(os.getenv("SEARCH_CACHE_THRESHOLD", "0.95"))  # cosine similarity for a cached search hit
+    STATS_CACHE_TTL: float = float(os.getenv("STATS_CACHE_TTL", "5"))  # seconds the sidebar reuses database stats
+    
+    # Batching Configuration
+    EMBEDDING_BATCH_SIZE: int = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))  # texts per encoder forward pass
+    EMBEDDING_MAX_BATCH: int = int(os.getenv("EMBEDDING_MAX_BATCH", "32"))
+    EMBEDDING_BATCH_WAIT_MS: float = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "5"))
+    SEARCH_MAX_BATCH: int = int(os.getenv("SEARCH_MAX_BATCH", "32"))  # queries per Milvus search request
+    SEARCH_BATCH_WAIT_MS: float = float(os.getenv("SEARCH_BATCH_WAIT_MS", "5"))
+    SEARCH_GROUP_SIZE: int = int(os.getenv("SEARCH_GROUP_SIZE", "8"))  # similar queries sent per request, requests run in parallel
+    
+    # Agent Configuration (AGENT_STRICT=1 lets router errors propagate instead of returning an error answer)
+    AGENT_STRICT: bool = os.getenv("AGENT_STRICT", "0") == "1"
+    
     # File Upload Configuration
     MAX_FILE_SIZE_MB: int = 50
-    ALLOWED_EXTENSIONS: set = {'.pdf', '.docx', '.pptx', '.xlsx', '.txt'}
+    ALLOWED_EXTENSIONS: frozenset = frozenset({'.pdf', '.docx', '.pptx', '.xlsx', '.txt'})
     
-    @classmethod
-    def validate(cls) -> bool:
+    def validate(self) -> bool:
         """Validate that required configuration is present."""
-        if not cls.GOOGLE_API_KEY:
+        if not self.GOOGLE_API_KEY:
             raise ValueError("GOOGLE_API_KEY is required. Please set it in .env file")
         return True
 
@@ -2,9 +2,14 @@
 
 import logging
 import sys
-from datetime import datetime
+from logging.handlers import MemoryHandler, TimedRotatingFileHandler
 from pathlib import Path
 
+# File records are buffered and written in batches; anything at WARNING or
+# above flushes the buffer immediately
+LOG_BUFFER_RECORDS = 256
+LOG_BACKUP_DAYS = 7
+
 
 def setup_logger(name: str = "agentic_rag", level: int = logging.INFO) -> logging.Logger:
     """
@@ -37,17 +42,28 @@ def setup_logger(name: str = "agentic_rag", level: int = logging.INFO) -> loggin
     console_handler.setFormatter(detailed_formatter)
     logger.addHandler(console_handler)
     
-    # File handler (optional)
+    # File handler (optional): one file per day, opened on the first write
     try:
         log_dir = Path("logs")
         log_dir.mkdir(exist_ok=True)
         
-        file_handler = logging.FileHandler(
-            log_dir / f"app_{datetime.now().strftime('%Y%m%d')}.log"
+        file_handler = TimedRotatingFileHandler(
+            log_dir / "app.log",
+            when="midnight",
+            backupCount=LOG_BACKUP_DAYS,
+            encoding="utf-8",
+            delay=True
         )
         file_handler.setLevel(logging.DEBUG)
         file_handler.setFormatter(detailed_formatter)
-        logger.addHandler(file_handler)
+        
+        buffered_handler = MemoryHandler(
+            LOG_BUFFER_RECORDS,
+            flushLevel=logging.WARNING,
+            target=file_handler
+        )
+        buffered_handler.setLevel(logging.DEBUG)
+        logger.addHandler(buffered_handler)
     except Exception as e:
         logger.warning(f"Could not create file handler: {e}")
     
@@ -0,0 +1,125 @@
+"""
+Client-side vector similarity kernels.
+Compiled with Numba when it is installed, plain numpy otherwise.
+"""
+
+from typing import Sequence, Union
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+ArrayLike = Union[np.ndarray, Sequence[float], Sequence[Sequence[float]]]
+
+
+if numba is not None:
+
+    @numba.njit(cache=True, fastmath=True, parallel=True)
+    def _cosine_scores(query: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+        n, dim = vectors.shape
+        scores = np.empty(n, dtype=np.float32)
+
+        query_norm = 0.0
+        for j in range(dim):
+            query_norm += query[j] * query[j]
+        query_norm = np.sqrt(query_norm)
+
+        for i in numba.prange(n):
+            dot = 0.0
+            norm = 0.0
+            for j in range(dim):
+                dot += vectors[i, j] * query[j]
+                norm += vectors[i, j] * vectors[i, j]
+            denom = np.sqrt(norm) * query_norm
+            scores[i] = dot / denom if denom > 0.0 else 0.0
+
+        return scores
+
+else:
+
+    def _cosine_scores(query: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(query)
+        return ((vectors @ query) / np.maximum(norms, 1e-12)).astype(np.float32)
+
+
+def cosine_scores(query: ArrayLike, vectors: ArrayLike) -> np.ndarray:
+    """
+    Cosine similarity between a query and each row of a matrix.
+
+    Args:
+        query: Query vector of shape (dim,)
+        vectors: Candidate vectors of shape (n, dim)
+
+    Returns:
+        float32 array of shape (n,)
+    """
+    query = np.ascontiguousarray(query, dtype=np.float32).ravel()
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+
+    if vectors.size == 0:
+        return np.empty(0, dtype=np.float32)
+
+    return _cosine_scores(query, vectors.reshape(len(vectors), -1))
+
+
+def cosine_topk(query: ArrayLike, vectors: ArrayLike, k: int) -> np.ndarray:
+    """
+    Indices of the k rows most similar to the query, best first.
+
+    Args:
+        query: Query vector of shape (dim,)
+        vectors: Candidate vectors of shape (n, dim)
+        k: Number of indices to return
+
+    Returns:
+        int array of shape (min(k, n),)
+    """
+    scores = cosine_scores(query, vectors)
+
+    if k < 1:
+        return np.empty(0, dtype=np.intp)
+    if k < len(scores):
+        idx = np.argpartition(-scores, k - 1)[:k]
+    else:
+        idx = np.arange(len(scores))
+
+    return idx[np.argsort(-scores[idx], kind='stable')]
+
+
+def similarity_order(vectors: ArrayLike) -> np.ndarray:
+    """
+    Order rows so that similar vectors end up next to each other.
+
+    Greedy nearest-neighbour chain: start from the first row and
+    repeatedly step to the most similar row not yet visited.
+
+    Args:
+        vectors: Vectors of shape (n, dim)
+
+    Returns:
+        int array of shape (n,), a permutation of the row indices
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n = len(vectors)
+    if n < 3:
+        return np.arange(n)
+
+    unit = vectors.reshape(n, -1)
+    unit = unit / np.maximum(np.linalg.norm(unit, axis=1, keepdims=True), 1e-12)
+    similarities = unit @ unit.T
+
+    order = np.empty(n, dtype=np.intp)
+    visited = np.zeros(n, dtype=bool)
+    current = 0
+    for step in range(n):
+        order[step] = current
+        visited[current] = True
+        if step + 1 < n:
+            row = np.where(visited, -np.inf, similarities[current])
+            current = int(np.argmax(row))
+
+    return order
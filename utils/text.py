@@ -0,0 +1,252 @@
+"""
+Text normalization and chunking kernels.
+ASCII text is processed as bytes by Numba-compiled loops when Numba is
+installed; everything else goes through the pure-Python implementation.
+"""
+
+import re
+from bisect import bisect_right
+from typing import Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+# Whitespace normalization: horizontal runs become one space, then runs
+# spanning two or more line breaks become a paragraph break
+_WS_RE = re.compile(r'[^\S\n]+')
+_PARA_RE = re.compile(r' ?\n(?: ?\n)+ ?')
+_LINE_RE = re.compile(r' ?\n ?')
+
+# Preferred chunk break points; a match ends just after '.' or '\n'
+_BREAK_RE = re.compile(r'\.(?= )|\n')
+
+_DOT, _SPACE, _NEWLINE = ord('.'), ord(' '), ord('\n')
+
+
+if numba is not None:
+
+    @numba.njit(cache=True, inline='always')
+    def _is_space(c: int) -> bool:
+        # str.isspace() for ASCII: \t \n \v \f \r, \x1c-\x1f and space
+        return (9 <= c <= 13) or (28 <= c <= 32)
+
+    @numba.njit(cache=True, nogil=True)
+    def _normalize_whitespace(buf: np.ndarray) -> np.ndarray:
+        out = np.empty(buf.size, dtype=np.uint8)
+        n = 0
+        in_run = False
+        newlines = 0
+        for i in range(buf.size):
+            c = buf[i]
+            if _is_space(c):
+                in_run = True
+                if c == _NEWLINE:
+                    newlines += 1
+            else:
+                if in_run and n > 0:
+                    if newlines >= 2:
+                        out[n] = _NEWLINE
+                        out[n + 1] = _NEWLINE
+                        n += 2
+                    else:
+                        out[n] = _NEWLINE if newlines == 1 else _SPACE
+                        n += 1
+                in_run = False
+                newlines = 0
+                out[n] = c
+                n += 1
+        return out[:n]
+
+    @numba.njit(cache=True, nogil=True)
+    def _chunk_spans_nb(buf: np.ndarray, chunk_size: int, chunk_overlap: int, final: bool):
+        n = buf.size
+
+        # Offsets just past each sentence end / newline
+        boundaries = np.empty(n, dtype=np.int64)
+        nb = 0
+        for i in range(n):
+            c = buf[i]
+            if c == _NEWLINE or (c == _DOT and i + 1 < n and buf[i + 1] == _SPACE):
+                boundaries[nb] = i + 1
+                nb += 1
+        boundaries = boundaries[:nb]
+
+        spans = []
+        start = 0
+        min_break = chunk_size * 0.5
+
+        while start < n and (final or start + chunk_size < n):
+            end = start + chunk_size
+
+            if end < n:
+                i = np.searchsorted(boundaries, end, side='right') - 1
+                if i >= 0 and boundaries[i] == end and buf[end - 1] == _DOT:
+                    i -= 1
+                if i >= 0 and boundaries[i] - start - 1 > min_break:
+                    end = boundaries[i]
+
+            lo = start
+            hi = min(end, n)
+            while lo < hi and _is_space(buf[lo]):
+                lo += 1
+            while hi > lo and _is_space(buf[hi - 1]):
+                hi -= 1
+            if lo < hi:
+                spans.append((lo, hi))
+
+            start = end - chunk_overlap
+            if end >= n:
+                break
+
+        return spans, start
+
+
+def _ascii_bytes(text: str) -> np.ndarray:
+    return np.frombuffer(text.encode('ascii'), dtype=np.uint8)
+
+
+def normalize_whitespace(text: str) -> str:
+    """
+    Normalize whitespace while keeping line and paragraph structure.
+
+    Each whitespace run becomes a paragraph break if it spans two or more
+    newlines, a single newline if it spans one, and a space otherwise.
+    Leading and trailing whitespace is stripped.
+
+    Args:
+        text: Input text
+
+    Returns:
+        Normalized text
+    """
+    if numba is not None and text.isascii():
+        return _normalize_whitespace(_ascii_bytes(text)).tobytes().decode('ascii')
+
+    text = _WS_RE.sub(' ', text)
+    text = _PARA_RE.sub('\n\n', text)
+    return _LINE_RE.sub('\n', text).strip()
+
+
+def _chunk_spans_py(
+    text: str,
+    chunk_size: int,
+    chunk_overlap: int,
+    final: bool
+) -> Tuple[List[Tuple[int, int]], int]:
+    boundaries = [m.end() for m in _BREAK_RE.finditer(text)]
+
+    spans = []
+    start = 0
+    text_length = len(text)
+    min_break = chunk_size * 0.5
+
+    # Without final, stop at the first window that could still grow
+    while start < text_length and (final or start + chunk_size < text_length):
+        end = start + chunk_size
+
+        # Try to break at the last boundary in the window, if we're past halfway
+        if end < text_length:
+            i = bisect_right(boundaries, end) - 1
+            if i >= 0 and boundaries[i] == end and text[end - 1] == '.':
+                i -= 1  # its following space is outside the window
+            if i >= 0 and boundaries[i] - start - 1 > min_break:
+                end = boundaries[i]
+
+        # Trim surrounding whitespace by index so the chunk is sliced once
+        lo, hi = start, min(end, text_length)
+        while lo < hi and text[lo].isspace():
+            lo += 1
+        while hi > lo and text[hi - 1].isspace():
+            hi -= 1
+        if lo < hi:
+            spans.append((lo, hi))
+
+        # Move start position with overlap
+        start = end - chunk_overlap
+
+        # Prevent infinite loop
+        if end >= text_length:
+            break
+
+    return spans, start
+
+
+def _chunk_spans(
+    text: str,
+    chunk_size: int,
+    chunk_overlap: int,
+    final: bool
+) -> Tuple[List[Tuple[int, int]], int]:
+    """Chunk offsets plus the start of the first window not yet emitted."""
+    if numba is not None and text.isascii():
+        spans, start = _chunk_spans_nb(_ascii_bytes(text), chunk_size, chunk_overlap, final)
+        return list(spans), start
+    return _chunk_spans_py(text, chunk_size, chunk_overlap, final)
+
+
+def chunk_spans(text: str, chunk_size: int, chunk_overlap: int) -> List[Tuple[int, int]]:
+    """
+    Compute overlapping chunk offsets, preferring sentence or line breaks.
+
+    A window is cut at its last break point when that lies past the
+    halfway mark; each span excludes surrounding whitespace and empty
+    spans are dropped.
+
+    Args:
+        text: Input text
+        chunk_size: Maximum chunk length in characters
+        chunk_overlap: Characters shared by consecutive windows
+
+    Returns:
+        List of (start, end) offsets into text
+    """
+    if not text:
+        return []
+
+    return _chunk_spans(text, chunk_size, chunk_overlap, final=True)[0]
+
+
+def iter_chunks(
+    fragments: Iterable[str],
+    chunk_size: int,
+    chunk_overlap: int
+) -> Iterator[str]:
+    """
+    Clean and chunk text that arrives in pieces, e.g. one PDF page at a time.
+
+    Fragments are whitespace-normalized and joined with a paragraph break
+    into a rolling buffer; chunks are yielded as soon as no later text can change
+    them. The result equals chunking the cleaned concatenation at once.
+
+    Args:
+        fragments: Text pieces in document order
+        chunk_size: Maximum chunk length in characters
+        chunk_overlap: Characters shared by consecutive windows
+
+    Yields:
+        Text chunks
+    """
+    buffer = ""
+
+    for fragment in fragments:
+        fragment = normalize_whitespace(fragment)
+        if not fragment:
+            continue
+
+        buffer = f"{buffer}\n\n{fragment}" if buffer else fragment
+        if len(buffer) <= chunk_size:
+            continue
+
+        spans, start = _chunk_spans(buffer, chunk_size, chunk_overlap, final=False)
+        for lo, hi in spans:
+            yield buffer[lo:hi]
+        buffer = buffer[start:]
+
+    if buffer:
+        for lo, hi in _chunk_spans(buffer, chunk_size, chunk_overlap, final=True)[0]:
+            yield buffer[lo:hi]